@@ -1,37 +1,386 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
 
-from flask import Flask, jsonify
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
-import pandas as pd
+
+import benchmark_jobs
+import result_store
+from benchmark_registry import DATASETS, ENGINES
+from compare_data import compute_etag, dumps_json, get_compare_data
+
+# pandas jest importowany leniwie - tylko endpointy liczące ad hoc go potrzebują (szybki start workera)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 CORS(app)  # Dodaj CORS dla wszystkich endpointów
 
-# Funkcja do wczytywania danych z Excela
-def load_excel_data():
-    df = pd.read_excel('compare_databases.xlsx')
-    df['source'] = df['Baza danych'].apply(lambda x: 'MongoDB' if 'MongoDB' in str(x) else 'PostgreSQL')
-    df['Zapytanie'] = df['Zapytanie'].fillna("N/A")  # Upewniamy się, że brakujące wartości są uzupełnione
-    postgresql_data = df[df['source'] == 'PostgreSQL']
-    mongodb_data = df[df['source'] == 'MongoDB']
-    return postgresql_data, mongodb_data
+# Kodowania w kolejności preferencji serwera
+_ENCODERS = {
+    'br': lambda data: brotli.compress(data, quality=5),
+    'gzip': lambda data: gzip.compress(data, compresslevel=6),
+}
+
+def _choose_encoding():
+    for encoding in _ENCODERS:
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def _encoded_body(entry, encoding):
+    if encoding is None:
+        return entry['body'].encode("utf-8")
+    # Słownik 'encoded' należy do jednej wersji danych (nowa wersja to nowy wpis), więc nie trafi
+    # do niego body innej wersji
+    encoded = entry['encoded'].get(encoding)
+    if encoded is None:
+        encoded = _ENCODERS[encoding](entry['body'].encode("utf-8"))
+        entry['encoded'][encoding] = encoded
+    return encoded
+
+def _representation_etag(entry, encoding):
+    # Silny ETag musi być inny dla każdej reprezentacji - body gzip i br to różne bajty
+    return entry['etag'] if encoding is None else f"{entry['etag']}-{encoding}"
+
+def cached_json_response(entry):
+    """304 when If-None-Match matches the ETag of the negotiated encoding, else the (compressed)
+    pre-serialized body."""
+    encoding = _choose_encoding()
+    etag = _representation_etag(entry, encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(_encoded_body(entry, encoding), mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    # Przeglądarka może trzymać odpowiedź, ale musi ją zweryfikować ETagiem przy każdym użyciu
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def json_response(data):
+    """Serializes data and answers with the same ETag/304/compression handling as /compare."""
+    body = dumps_json(data)
+    return cached_json_response({'body': body, 'etag': compute_etag(body), 'encoded': {}})
+
+def json_error(message, status=400):
+    return Response(dumps_json({'error': message}), status=status, mimetype='application/json')
 
 @app.route('/compare', methods=['GET'])
 def compare():
-    postgresql_data, mongodb_data = load_excel_data()
-    
-    # Dodajemy 'Zapytanie' do MongoDB
-    response = {
-        'PostgreSQL': postgresql_data[['Baza danych', 'Czas wykonania (s)', 'Maksymalna wydajność CPU (%)', 
-                                       'Maksymalne zużycie RAM (MB)', 'Zapytanie', 
-                                       'Średnia wydajność CPU (%)', 'Średnie zużycie RAM (MB)']].to_dict(orient='records'),
-        
-        'MongoDB': mongodb_data[['Baza danych', 'Czas wykonania (s)', 'Maksymalna wydajność CPU (%)', 
-                                 'Maksymalne zużycie RAM (MB)', 'Zapytanie',  # Dodajemy kolumnę 'Zapytanie'
-                                 'Średnia wydajność CPU (%)', 'Średnie zużycie RAM (MB)']].to_dict(orient='records')
+    return cached_json_response(get_compare_data())
+
+# Domyślny i maksymalny rozmiar strony w /results
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Kolumny zwracane w /results (iteration_times tylko na życzenie - potrafią być długie)
+RESULT_COLUMNS = ['run_id', 'dataset', 'engine', 'section', 'query_index', 'query', 'recorded_at',
+                  'connection_mode', 'iterations', 'execution_time', 'time_min', 'time_median', 'time_mean',
+                  'time_p95', 'time_p99', 'time_std', 'time_ci_low', 'time_ci_high', 'avg_cpu', 'max_cpu',
+                  'avg_process_cpu', 'max_process_cpu', 'avg_ram', 'max_ram', 'io_read_mb', 'io_write_mb',
+                  'connect_time', 'server_cpu_time', 'server_rss_delta_mb', 'plan_execution_ms',
+                  'plan_rows_examined', 'plan_rows_returned', 'plan_indexes']
+
+# Wczytane tabele result_store ostatnio używanych przebiegów (LRU), unieważniane przy zmianie plików
+# (table_signature); limit chroni długo działający worker przed trzymaniem wszystkich przebiegów
+STORE_CACHE_RUNS = int(os.getenv('STORE_CACHE_RUNS', '8'))
+_store_cache = OrderedDict()
+_store_lock = threading.Lock()
+
+def load_run_results(run_id):
+    signature = result_store.table_signature('results', run_id)
+    with _store_lock:
+        cached = _store_cache.get(run_id)
+        if cached is not None and cached[0] == signature:
+            _store_cache.move_to_end(run_id)
+            return cached[1]
+        df = result_store.load_table('results', run_id)
+        _store_cache[run_id] = (signature, df)
+        _store_cache.move_to_end(run_id)
+        while len(_store_cache) > STORE_CACHE_RUNS:
+            _store_cache.popitem(last=False)
+    return df
+
+def _selected_runs():
+    runs = result_store.list_runs()
+    requested = request.args.get('run')
+    if not requested:
+        return runs[-1:]
+    if requested == 'all':
+        return runs
+    selected = requested.split(',')
+    unknown = [run for run in selected if run not in runs]
+    if unknown:
+        raise ValueError(f"Unknown run: {', '.join(unknown)}")
+    return selected
+
+def filtered_results():
+    """Result records of the selected runs, filtered by the dataset/engine/query parameters."""
+    import pandas as pd
+
+    frames = [load_run_results(run) for run in _selected_runs()]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=RESULT_COLUMNS + ['iteration_times'])
+    df = pd.concat(frames, ignore_index=True)
+
+    mask = pd.Series(True, index=df.index)
+    for column, allowed in (('dataset', DATASETS), ('engine', ENGINES)):
+        values = request.args.get(column)
+        if values:
+            values = values.split(',')
+            invalid = [v for v in values if v not in allowed]
+            if invalid:
+                raise ValueError(f"Unknown {column}: {', '.join(invalid)}")
+            mask &= df[column].isin(values)
+    if request.args.get('query_index'):
+        mask &= df['query_index'] == int(request.args['query_index'])
+    if request.args.get('query'):
+        mask &= df['query'].str.contains(request.args['query'], case=False, regex=False)
+    return df[mask]
+
+def _page_parameters():
+    page = int(request.args.get('page', 1))
+    page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    return page, page_size
+
+def paginate(df, page, page_size):
+    start = (page - 1) * page_size
+    return {
+        'total': len(df),
+        'page': page,
+        'page_size': page_size,
+        'items': df.iloc[start:start + page_size].astype(object).where(lambda d: d.notna(), None)
+                   .to_dict(orient='records'),
     }
-    
-    return jsonify(response)
+
+@app.route('/results/runs', methods=['GET'])
+def result_runs():
+    return json_response({'runs': result_store.list_runs()})
+
+@app.route('/results', methods=['GET'])
+def results():
+    """Paged result records; filters: run (id, comma list or 'all'; default latest), dataset, engine,
+    query (substring), query_index; include_times=1 adds the raw iteration times."""
+    try:
+        page, page_size = _page_parameters()
+        df = filtered_results()
+    except ValueError as e:
+        return json_error(str(e))
+
+    columns = [c for c in RESULT_COLUMNS if c in df.columns]
+    if request.args.get('include_times') == '1':
+        columns.append('iteration_times')
+    df = df.sort_values(['run_id', 'dataset', 'engine', 'query_index'])[columns]
+    return json_response(paginate(df, page, page_size))
+
+@app.route('/results/aggregate', methods=['GET'])
+def aggregate_results():
+    """Per-query median and p95 over all iterations of the selected runs, one row per
+    (dataset, query_index) with both engines side by side and the PostgreSQL/MongoDB ratio.
+    Records of the asyncio backend (connection_mode 'async') get their own columns, e.g. postgresql_async_median."""
+    import pandas as pd
+
+    try:
+        page, page_size = _page_parameters()
+        df = filtered_results()
+    except ValueError as e:
+        return json_error(str(e))
+    if df.empty:
+        return json_response(paginate(df, page, page_size))
+
+    # Pomiary przez sterownik asynchroniczny osobno - nie mieszają się z synchronicznymi tego samego silnika
+    df = df.assign(engine=df['engine'].where(df['connection_mode'] != 'async', df['engine'] + '_async'))
+
+    # Jeden wiersz na iterację, potem agregacja group-by po wszystkich przebiegach naraz
+    times = df[['dataset', 'engine', 'query_index', 'iteration_times']].explode('iteration_times')
+    times['iteration_times'] = times['iteration_times'].astype(float)
+    grouped = times.groupby(['dataset', 'query_index', 'engine'])['iteration_times']
+    stats = pd.DataFrame({
+        'median': grouped.median(),
+        'p95': grouped.quantile(0.95),
+        'iterations': grouped.size(),
+    }).unstack('engine')
+    stats.columns = [f"{engine}_{stat}" for stat, engine in stats.columns]
+
+    labels = df.pivot_table(index=['dataset', 'query_index'], columns='engine', values='query', aggfunc='first')
+    labels.columns = [f"{engine}_query" for engine in labels.columns]
+    stats = stats.join(labels)
+    if 'postgresql_median' in stats and 'mongodb_median' in stats:
+        stats['ratio_postgresql_mongodb'] = stats['postgresql_median'] / stats['mongodb_median']
+
+    stats = stats.reset_index()
+    stats['dataset_order'] = stats['dataset'].map({d: i for i, d in enumerate(DATASETS)})
+    stats = stats.sort_values(['dataset_order', 'query_index']).drop(columns='dataset_order')
+    return json_response(paginate(stats, page, page_size))
+
+# Co ile sekund strumień sprawdza nowe rekordy przebiegu i co ile wysyła keep-alive
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', '0.5'))
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+# Strumień zajmuje wątek gunicorna: najdłuższy czas jednego połączenia i czas bez nowych rekordów,
+# po których jest zamykany (EventSource może wznowić od Last-Event-ID)
+STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', '1800'))
+STREAM_IDLE_SECONDS = float(os.getenv('STREAM_IDLE_SECONDS', '300'))
+
+# Statusy zadania, po których przebieg nie zapisze już znacznika ukończenia
+_ENDED_JOB_STATUSES = ('failed', 'cancelled')
+
+_SAMPLE_KEYS = ['run_id', 'dataset', 'engine', 'section', 'query_index', 'query', 'source']
+
+def _sse(event, data, event_id=None):
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {dumps_json(data).rstrip()}\n\n"
+
+def _group_samples(rows):
+    """Groups new time-series rows into one delta message per (query, source)."""
+    groups = {}
+    for row in rows:
+        key = tuple(row.get(k) for k in _SAMPLE_KEYS)
+        point = {k: v for k, v in row.items() if k not in _SAMPLE_KEYS}
+        groups.setdefault(key, []).append(point)
+    return [dict(zip(_SAMPLE_KEYS, key), points=points) for key, points in groups.items()]
+
+def _resume_positions():
+    # Last-Event-ID (wysyłany przez EventSource przy ponownym połączeniu) niesie pozycje odczytu
+    try:
+        positions = json.loads(request.headers.get('Last-Event-ID', ''))
+        return positions['results'], positions['timeseries']
+    except (ValueError, KeyError, TypeError):
+        return {}, {}
+
+@app.route('/results/stream', methods=['GET'])
+def stream_results():
+    """Server-Sent Events with the records of a run as they are written.
+
+    Only deltas are sent: a 'result' event per finished query, a 'samples' event with the new
+    sampler points of a query, and 'done' when the run is complete. A run whose job failed or was
+    cancelled ends with 'done' carrying that status. The stream is closed with an 'end' event after
+    STREAM_MAX_SECONDS, or STREAM_IDLE_SECONDS without new records. The event id holds the read
+    positions, so a reconnecting EventSource resumes without repeating messages.
+    """
+    try:
+        runs = _selected_runs()
+    except ValueError as e:
+        return json_error(str(e))
+    if len(runs) != 1:
+        return json_error("Streaming needs exactly one run")
+    run_id = runs[0]
+    result_positions, sample_positions = _resume_positions()
+
+    def generate():
+        started = last_message = last_record = time.monotonic()
+        while True:
+            # Flaga sprawdzana przed odczytem - rekordy dopisane przed jej ustawieniem zostaną wysłane
+            complete = result_store.is_complete(run_id)
+            samples = result_store.read_new_records('timeseries', sample_positions, run_id)
+            results = result_store.read_new_records('results', result_positions, run_id)
+            event_id = dumps_json({'results': result_positions, 'timeseries': sample_positions}).rstrip()
+
+            for message in _group_samples(samples):
+                yield _sse('samples', message)
+            for record in results:
+                yield _sse('result', record)
+            if samples or results:
+                yield _sse('progress', {'run_id': run_id, 'results': sum(
+                    position['rows'] for position in result_positions.values())}, event_id)
+                last_message = last_record = time.monotonic()
+
+            if complete:
+                yield _sse('done', {'run_id': run_id}, event_id)
+                return
+            if not (samples or results):
+                # Zadanie przerwane nie zapisze znacznika ukończenia - bez tego strumień czekałby w nieskończoność
+                job = benchmark_jobs.get_job_by_run(run_id)
+                if job is not None and job['status'] in _ENDED_JOB_STATUSES:
+                    yield _sse('done', {'run_id': run_id, 'status': job['status'], 'error': job['error']}, event_id)
+                    return
+            now = time.monotonic()
+            if now - started > STREAM_MAX_SECONDS or now - last_record > STREAM_IDLE_SECONDS:
+                reason = 'max_duration' if now - started > STREAM_MAX_SECONDS else 'idle'
+                yield _sse('end', {'run_id': run_id, 'reason': reason}, event_id)
+                return
+            if time.monotonic() - last_message > STREAM_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_message = time.monotonic()
+            time.sleep(STREAM_POLL_SECONDS)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Wyłącza buforowanie odpowiedzi w nginx przed gunicornem
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/runs', methods=['POST'])
+def submit_run():
+    """Queues a benchmark job: {"datasets", "engines", "iterations", "warmup", "concurrency", "duration",
+    "parallel"}; concurrency > 1 runs a load test instead of the per-query measurement."""
+    try:
+        job = benchmark_jobs.submit(request.get_json(silent=True))
+    except ValueError as e:
+        return json_error(str(e))
+    benchmark_jobs.ensure_runner()
+    response = Response(dumps_json(job), status=202, mimetype='application/json')
+    response.headers['Location'] = f"/runs/{job['job_id']}"
+    return response
+
+@app.route('/runs', methods=['GET'])
+def list_runs():
+    benchmark_jobs.ensure_runner()
+    return Response(dumps_json({'jobs': benchmark_jobs.list_jobs()}), mimetype='application/json')
+
+@app.route('/runs/<job_id>', methods=['GET'])
+def run_status(job_id):
+    job = benchmark_jobs.get_job(job_id)
+    if job is None:
+        return json_error(f"Unknown job: {job_id}", 404)
+    return Response(dumps_json(job), mimetype='application/json')
+
+@app.route('/runs/<job_id>/cancel', methods=['POST'])
+def cancel_run(job_id):
+    job = benchmark_jobs.cancel(job_id)
+    if job is None:
+        return json_error(f"Unknown job: {job_id}", 404)
+    return Response(dumps_json(job), mimetype='application/json')
+
+@app.route('/runs/<job_id>/results', methods=['GET'])
+def run_results(job_id):
+    """Result records of a job's run (paged like /results), or its load-test records."""
+    import pandas as pd
+
+    job = benchmark_jobs.get_job(job_id)
+    if job is None:
+        return json_error(f"Unknown job: {job_id}", 404)
+    try:
+        page, page_size = _page_parameters()
+    except ValueError as e:
+        return json_error(str(e))
+
+    if job['spec']['kind'] == 'load':
+        path = benchmark_jobs.load_output_file(job)
+        records = pd.read_json(path, lines=True, dtype=False) if os.path.exists(path) else pd.DataFrame()
+    else:
+        records = load_run_results(job['run_id'])
+        if not records.empty:
+            records = records.sort_values(['dataset', 'engine', 'query_index'])
+    return json_response({'job': job, **paginate(records, page, page_size)})
 
 if __name__ == '__main__':
     
-    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000)
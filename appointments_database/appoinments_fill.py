@@ -1,5 +1,7 @@
+import io
+import os
+
 import dask.dataframe as dd
-import pandas as pd
 from sqlalchemy import create_engine
 
 # Ustawienia połączenia
@@ -14,34 +16,91 @@ PORT = 5432
 # Utwórz silnik SQLAlchemy
 engine = create_engine(f'{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}')
 
-def insert_data_in_batches(dataframe, batch_size):
-    # Oblicz liczbę partii
-    total_rows = dataframe.shape[0].compute()
-    num_batches = (total_rows // batch_size) + 1
-
-    for batch in range(num_batches):
-        start = batch * batch_size
-        end = start + batch_size
-        
-        # Pobierz partię i konwertuj do pandas DataFrame
-        batch_df = dataframe.loc[start:end].compute()
-
-        # Sprawdź, które appointment_id już istnieją w bazie
-        existing_ids = pd.read_sql_query("SELECT appointment_id FROM appointments", con=engine)['appointment_id'].tolist()
-        batch_df = batch_df[~batch_df['appointment_id'].isin(existing_ids)]
-
-        # Wstaw dane do bazy, jeśli są nowe
-        if not batch_df.empty:
-            batch_df.to_sql('appointments', engine, if_exists='append', index=False)
-            print(f"Wstawiono partię {batch + 1} z {num_batches}")
-        else:
-            print(f"Brak nowych danych do wstawienia w partii {batch + 1}.")
+# Rozmiar partycji Dask czytanej z CSV - jedna partycja = jedna transakcja i jeden punkt kontrolny
+BLOCKSIZE = '64MB'
+
+APPOINTMENT_COLUMNS = ['appointment_id', 'doctor_id', 'patient_id', 'appointment_date', 'diagnosis', 'treatment']
+
+# Postęp ładowania zapisywany w bazie, w tej samej transakcji co wiersze partycji
+CHECKPOINT_TABLE = """
+CREATE TABLE IF NOT EXISTS load_checkpoints (
+    source TEXT PRIMARY KEY,
+    partitions_done INTEGER NOT NULL,
+    rows_inserted BIGINT NOT NULL
+);
+"""
+
+
+def checkpoint_key(csv_path, blocksize):
+    # Podział na partycje zależy od pliku i blocksize - zmiana któregokolwiek to nowe ładowanie
+    stat = os.stat(csv_path)
+    return f"{os.path.abspath(csv_path)}:{stat.st_size}:{int(stat.st_mtime)}:{blocksize}"
+
+
+def read_checkpoint(conn, source):
+    with conn.cursor() as cursor:
+        cursor.execute(CHECKPOINT_TABLE)
+        cursor.execute("SELECT partitions_done, rows_inserted FROM load_checkpoints WHERE source = %s", (source,))
+        row = cursor.fetchone()
+    conn.commit()
+    return row or (0, 0)
+
+
+def insert_partition(cursor, batch_df):
+    """COPY into a temporary table, then INSERT ... ON CONFLICT DO NOTHING; returns rows inserted."""
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS appointments_stage (LIKE appointments INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+    buffer = io.StringIO()
+    batch_df[APPOINTMENT_COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ", ".join(APPOINTMENT_COLUMNS)
+    cursor.copy_expert(f"COPY appointments_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    # Istniejące appointment_id pomija klucz główny - bez pobierania ich do Pythona
+    cursor.execute(
+        f"INSERT INTO appointments ({columns}) SELECT {columns} FROM appointments_stage "
+        "ON CONFLICT (appointment_id) DO NOTHING"
+    )
+    return cursor.rowcount
+
+
+def insert_data_in_batches(dataframe, source):
+    """Loads the Dask partitions one after another, resuming after the last committed partition."""
+    conn = engine.raw_connection()
+    try:
+        partitions_done, rows_inserted = read_checkpoint(conn, source)
+        if partitions_done:
+            print(f"Wznawianie od partycji {partitions_done + 1} z {dataframe.npartitions} "
+                  f"({rows_inserted} wierszy już wstawionych)")
+
+        for partition in range(partitions_done, dataframe.npartitions):
+            # Każda partycja czytana raz, sekwencyjnie - bez loc[start:end] przeliczającego cały plik
+            batch_df = dataframe.get_partition(partition).compute()
+            with conn.cursor() as cursor:
+                inserted = insert_partition(cursor, batch_df)
+                rows_inserted += inserted
+                cursor.execute(
+                    "INSERT INTO load_checkpoints (source, partitions_done, rows_inserted) VALUES (%s, %s, %s) "
+                    "ON CONFLICT (source) DO UPDATE SET partitions_done = EXCLUDED.partitions_done, "
+                    "rows_inserted = EXCLUDED.rows_inserted",
+                    (source, partition + 1, rows_inserted),
+                )
+            conn.commit()
+            print(f"Wstawiono partię {partition + 1} z {dataframe.npartitions}: {inserted} nowych "
+                  f"z {len(batch_df)} wierszy")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return rows_inserted
+
 
 if __name__ == "__main__":
     # Załaduj dane z pliku CSV do Dask DataFrame
     csv_path = 'D:\\data_mining\\appointments.csv'  # Dostosuj ścieżkę
-    data = dd.read_csv(csv_path)
+    data = dd.read_csv(csv_path, blocksize=BLOCKSIZE)
 
-    # Wstaw dane w partiach
-    batch_size = 100  # Możesz dostosować rozmiar partii
-    insert_data_in_batches(data, batch_size)
+    # Wstaw dane partycjami; przerwane ładowanie wznawia się od ostatniej zatwierdzonej partycji
+    total = insert_data_in_batches(data, checkpoint_key(csv_path, BLOCKSIZE))
+    print(f"Załadowano {total} nowych wierszy.")
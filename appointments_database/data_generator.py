@@ -1,91 +1,283 @@
-from faker import Faker
+"""Vectorized generator of the clinic dataset (doctors, patients, appointments).
+
+Ids, dates, diagnoses and treatments are sampled as NumPy arrays; names and phone numbers are
+drawn from pools pre-built with Faker through index arrays, so the cost per row is a few array
+operations instead of several Faker calls. The same seed (and reference date) always gives the
+same files.
+
+Uniform by default; a skew configuration (dataset_generator.py --skew/--seasonality/
+--diagnosis-correlation) makes the key and category columns Zipfian, the dates seasonal and the
+diagnosis depend on the doctor's specialization:
+
+    {'columns': {'doctor_id': 1.1, 'patient_id': 0.8, 'diagnosis': 1.2}, 'seasonality': 0.5,
+     'diagnosis_correlation': 0.7}
+"""
+import datetime
+import math
+import os
+import zlib
+
+import numpy as np
 import pandas as pd
-import random
+from faker import Faker
+
+# Rozmiar puli imion, nazwisk i numerów telefonów losowanych z Fakera
+FAKER_POOL_SIZE = int(os.getenv('FAKER_POOL_SIZE', '10000'))
 
-fake = Faker()
+# Liczba wierszy tabel przy współczynniku skali 1 (dataset_generator.py mnoży je przez SF)
+SCALE_FACTOR_ROWS = {'doctors': 1_000, 'patients': 100_000, 'appointments': 1_000_000}
+
+# Schemat PostgreSQL zgodny z modelami z database_fill.py (bulk_loader.py --create-schema)
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS doctors (
+    doctor_id INTEGER PRIMARY KEY,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    email VARCHAR(100),
+    specialization VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id INTEGER PRIMARY KEY,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    birthdate DATE,
+    phone_number VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    appointment_id INTEGER PRIMARY KEY,
+    doctor_id INTEGER REFERENCES doctors (doctor_id),
+    patient_id INTEGER REFERENCES patients (patient_id),
+    appointment_date DATE,
+    diagnosis VARCHAR(100),
+    treatment VARCHAR(100)
+);
+"""
 
 # Lista przykładowych domen
 domains = ['example.com', 'hospital.com', 'medclinic.org', 'healthcare.net']
 
+specializations = ['Cardiology', 'Neurology', 'Orthopedics', 'Pediatrics', 'Dermatology']
+
+diagnoses = [
+    'Hypertension', 'Type 2 diabetes', 'Cold', 'Pneumonia',
+    'Asthma', 'Migraine', 'Urinary tract infection', 'Depression', 'Rheumatoid arthritis',
+    'Sleep disorders', 'Heart failure', 'Alzheimers disease', 'Bronchitis'
+]
+
+# Diagnozy typowe dla specjalizacji (korelacja diagnoza-specjalizacja); pozostałe stawia każdy lekarz
+specialization_diagnoses = {
+    'Cardiology': ['Hypertension', 'Heart failure'],
+    'Neurology': ['Migraine', 'Alzheimers disease', 'Sleep disorders', 'Depression'],
+    'Orthopedics': ['Rheumatoid arthritis'],
+    'Pediatrics': ['Cold', 'Asthma', 'Bronchitis', 'Pneumonia'],
+    'Dermatology': [],
+}
+
+# Kolumny, dla których można ustawić rozkład Zipfa, i tabela lub lista kategorii wyznaczająca zakres wartości
+SKEWABLE_COLUMNS = {'doctor_id': 'doctors', 'patient_id': 'patients', 'diagnosis': 'diagnoses',
+                    'treatment': 'treatments'}
+SKEW_OPTIONS = {'seasonality', 'diagnosis_correlation'}
+
+# Szczyt sezonu wizyt (dzień roku) - połowa stycznia, sezon infekcji
+SEASONAL_PEAK_DAY = 15
+
+treatments = [
+    'Pharmacological treatment', 'Physiotherapy', 'Psychological consultation',
+    'Surgery', 'Antibiotics', 'Anti-inflammatory drugs', 'Breathing exercises',
+    'Low-sodium diet', 'Painkillers', 'Antihistamines'
+]
+
+
+def build_pools(seed=None, size=FAKER_POOL_SIZE):
+    """Faker-generated value pools; rows index into them instead of calling Faker."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    first_names = np.array([fake.first_name() for _ in range(size)], dtype=object)
+    last_names = np.array([fake.last_name() for _ in range(size)], dtype=object)
+    return {
+        'first_name': first_names,
+        'last_name': last_names,
+        # Emaile budowane z małych liter - zamiana raz na pulę, nie na wiersz
+        'first_name_lower': np.array([name.lower() for name in first_names], dtype=object),
+        'last_name_lower': np.array([name.lower() for name in last_names], dtype=object),
+        'phone_number': np.array([fake.phone_number() for _ in range(size)], dtype=object),
+    }
+
+
+def _random_dates(rng, n, start, end):
+    """Uniform dates in [start, end] as datetime64[D]."""
+    start = np.datetime64(start, 'D')
+    span = (np.datetime64(end, 'D') - start).astype(int)
+    return start + rng.integers(0, span + 1, size=n)
 
-# Generowanie lekarzy z emailami opartymi o imię i nazwisk
-def generate_doctors(n):
-    doctors = []
-    specializations = ['Cardiology', 'Neurology', 'Orthopedics', 'Pediatrics', 'Dermatology']
 
-    for i in range(1, n + 1):
-        first_name = fake.first_name()
-        last_name = fake.last_name()
+def column_seed(seed, name):
+    """Seed of a per-column structure (key permutation, doctor specializations), the same in every chunk."""
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(name.encode()),))
 
-        # Tworzenie emaila na podstawie imienia, nazwiska i losowej domeny
-        email = f"{first_name.lower()}.{last_name.lower()}@{random.choice(domains)}"
 
-        doctors.append({
-            'doctor_id': i,
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': email,
-            'specialization': random.choice(specializations)
-        })
+def zipf_keys(rng, n, num_keys, exponent, seed):
+    """Keys 1..num_keys where the k-th most popular key has weight k ** -exponent.
 
-    return doctors
+    Ranks come from the inverse CDF of the continuous power law on [1, num_keys + 1), so no
+    per-key table is needed at any scale. A seeded affine permutation spreads the hot keys over
+    the key space instead of putting them at ids 1, 2, 3 ...
+    """
+    u = rng.random(n)
+    if abs(exponent - 1.0) < 1e-9:
+        ranks = np.exp(u * math.log(num_keys + 1))
+    else:
+        a = 1.0 - exponent
+        ranks = ((float(num_keys + 1) ** a - 1.0) * u + 1.0) ** (1.0 / a)
+    ranks = np.clip(ranks.astype(np.int64), 1, num_keys)
+
+    permutation = np.random.default_rng(seed)
+    multiplier = int(permutation.integers(1, max(num_keys, 2)))
+    while math.gcd(multiplier, num_keys) != 1:
+        multiplier += 1
+    offset = int(permutation.integers(0, num_keys))
+    return ((ranks - 1) * multiplier + offset) % num_keys + 1
+
+
+def sample_keys(rng, n, num_keys, column, context):
+    """Keys 1..num_keys of a column: uniform, or Zipfian when the skew configuration names it."""
+    exponent = context.get('skew', {}).get('columns', {}).get(column, 0.0)
+    if exponent <= 0:
+        return rng.integers(1, num_keys + 1, size=n)
+    return zipf_keys(rng, n, num_keys, exponent, column_seed(context['seed'], column))
+
+
+def seasonal_days(rng, n, start, end, amplitude, peak_day):
+    """Dates in [start, end] with density 1 + amplitude * cos(2 pi (day of year - peak_day) / 365.25)."""
+    start = np.datetime64(start, 'D')
+    days = start + np.arange((np.datetime64(end, 'D') - start).astype(int) + 1)
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(int) + 1
+    weights = 1.0 + amplitude * np.cos(2 * np.pi * (day_of_year - peak_day) / 365.25)
+    return days[rng.choice(len(days), size=n, p=weights / weights.sum())]
+
+
+def sample_dates(rng, n, start, end, context, peak_day):
+    """Uniform dates, or seasonal ones when the skew configuration sets 'seasonality' (0-1)."""
+    amplitude = context.get('skew', {}).get('seasonality', 0.0)
+    if amplitude <= 0:
+        return _random_dates(rng, n, start, end)
+    return seasonal_days(rng, n, start, end, amplitude, peak_day)
+
+
+def doctor_specializations(num_doctors, seed):
+    """Specialization index of every doctor id - appointment chunks need it without the doctors table."""
+    rng = np.random.default_rng(column_seed(seed, 'specialization'))
+    return rng.integers(0, len(specializations), size=num_doctors)
+
+
+# Generowanie lekarzy z emailami opartymi o imię i nazwisko
+def generate_doctors(n, rng, pools, start_id=1, seed=None):
+    first = rng.integers(0, len(pools['first_name']), size=n)
+    last = rng.integers(0, len(pools['last_name']), size=n)
+    email_domains = np.array(['@' + domain for domain in domains], dtype=object)
+    return pd.DataFrame({
+        'doctor_id': np.arange(start_id, start_id + n),
+        'first_name': pools['first_name'][first],
+        'last_name': pools['last_name'][last],
+        # Email na podstawie imienia, nazwiska i losowej domeny
+        'email': pools['first_name_lower'][first] + '.' + pools['last_name_lower'][last]
+                 + email_domains[rng.integers(0, len(domains), size=n)],
+        'specialization': np.array(specializations, dtype=object)[
+            doctor_specializations(start_id + n - 1, seed)[start_id - 1:]],
+    })
 
 
 # Generowanie pacjentów
-def generate_patients(n):
-    patients = []
-    for i in range(1, n + 1):
-        patients.append({
-            'patient_id': i,
-            'first_name': fake.first_name(),
-            'last_name': fake.last_name(),
-            'birthdate': fake.date_of_birth(minimum_age=0, maximum_age=90),
-            'phone_number': fake.phone_number()
-        })
-    return patients
+def generate_patients(n, rng, pools, start_id=1, reference_date=None):
+    today = reference_date or datetime.date.today()
+    # Jak Faker.date_of_birth(minimum_age=0, maximum_age=90): od (dziś - 91 lat + 1 dzień) do dziś
+    oldest = (pd.Timestamp(today) - pd.DateOffset(years=91) + pd.Timedelta(days=1)).date()
+    return pd.DataFrame({
+        'patient_id': np.arange(start_id, start_id + n),
+        'first_name': pools['first_name'][rng.integers(0, len(pools['first_name']), size=n)],
+        'last_name': pools['last_name'][rng.integers(0, len(pools['last_name']), size=n)],
+        'birthdate': _random_dates(rng, n, oldest, today),
+        'phone_number': pools['phone_number'][rng.integers(0, len(pools['phone_number']), size=n)],
+    })
 
 
 # Generowanie wizyt pacjentów u lekarzy
-def generate_appointments(n, doctor_ids, patient_ids):
-    diagnoses = [
-        'Hypertension', 'Type 2 diabetes', 'Cold', 'Pneumonia',
-        'Asthma', 'Migraine', 'Urinary tract infection', 'Depression', 'Rheumatoid arthritis',
-        'Sleep disorders', 'Heart failure', 'Alzheimers disease', 'Bronchitis'    
-    ]
-
-    treatments = [
-        'Pharmacological treatment', 'Physiotherapy', 'Psychological consultation',
-        'Surgery', 'Antibiotics', 'Anti-inflammatory drugs', 'Breathing exercises',
-        'Low-sodium diet', 'Painkillers', 'Antihistamines'
-    ]
-
-    appointments = []
-    for i in range(1, n + 1):
-        doctor_id = random.choice(doctor_ids)
-        patient_id = random.choice(patient_ids)
-        appointments.append({
-            'appointment_id': i,
-            'doctor_id': doctor_id,
-            'patient_id': patient_id,
-            'appointment_date': fake.date_this_year(),
-            'diagnosis': random.choice(diagnoses),
-            'treatment': random.choice(treatments)
-        })
-    return appointments
+def generate_appointments(n, num_doctors, num_patients, rng, start_id=1, reference_date=None, context=None):
+    context = context or {}
+    today = reference_date or datetime.date.today()
+    doctor_ids = sample_keys(rng, n, num_doctors, 'doctor_id', context)
+    patient_ids = sample_keys(rng, n, num_patients, 'patient_id', context)
+    # Jak Faker.date_this_year(): od 1 stycznia bieżącego roku do dziś
+    appointment_dates = sample_dates(rng, n, today.replace(month=1, day=1), today, context, SEASONAL_PEAK_DAY)
+    # Kategorie jak klucze 1..N: jednostajnie albo z rozkładu Zipfa (--skew diagnosis=..., treatment=...)
+    diagnosis = sample_keys(rng, n, len(diagnoses), 'diagnosis', context) - 1
+
+    correlation = context.get('skew', {}).get('diagnosis_correlation', 0.0)
+    if correlation > 0:
+        # Z prawdopodobieństwem `correlation` diagnoza typowa dla specjalizacji lekarza (jeśli ma takie);
+        # przy skośnej diagnozie także w obrębie typowych obowiązuje rozkład Zipfa
+        exponent = context.get('skew', {}).get('columns', {}).get('diagnosis', 0.0)
+        doctor_specialization = doctor_specializations(num_doctors, context['seed'])[doctor_ids - 1]
+        typical = rng.random(n) < correlation
+        for index, specialization in enumerate(specializations):
+            choices = [diagnoses.index(d) for d in specialization_diagnoses[specialization]]
+            rows = np.flatnonzero(typical & (doctor_specialization == index))
+            if not choices or not len(rows):
+                continue
+            if exponent > 0:
+                picks = zipf_keys(rng, len(rows), len(choices), exponent,
+                                  column_seed(context['seed'], f"diagnosis/{specialization}")) - 1
+            else:
+                picks = rng.integers(0, len(choices), size=len(rows))
+            diagnosis[rows] = np.array(choices)[picks]
+    treatment = sample_keys(rng, n, len(treatments), 'treatment', context) - 1
+
+    return pd.DataFrame({
+        'appointment_id': np.arange(start_id, start_id + n),
+        'doctor_id': doctor_ids,
+        'patient_id': patient_ids,
+        'appointment_date': appointment_dates,
+        'diagnosis': np.array(diagnoses, dtype=object)[diagnosis],
+        'treatment': np.array(treatments, dtype=object)[treatment],
+    })
+
+
+def generate_chunk(table, start_id, n, rng, pools, context):
+    """Rows start_id .. start_id + n - 1 of one table.
+
+    context holds 'sizes', 'reference_date', 'seed' and the optional 'skew' configuration.
+    """
+    if table == 'doctors':
+        return generate_doctors(n, rng, pools, start_id, context['seed'])
+    if table == 'patients':
+        return generate_patients(n, rng, pools, start_id, context['reference_date'])
+    if table == 'appointments':
+        return generate_appointments(n, context['sizes']['doctors'], context['sizes']['patients'], rng, start_id,
+                                     context['reference_date'], context)
+    raise ValueError(f"Unknown table: {table}")
 
 
 # Zapis danych do plików CSV
-def save_to_csv(data, filename):
-    df = pd.DataFrame(data)
+def save_to_csv(df, filename):
     df.to_csv(filename, index=False)
 
 
 # Główna funkcja do generowania danych
-def generate_database(num_doctors, num_patients, num_appointments):
-    doctors = generate_doctors(num_doctors)
-    patients = generate_patients(num_patients)
-    appointments = generate_appointments(num_appointments, [d['doctor_id'] for d in doctors],
-                                         [p['patient_id'] for p in patients])
+def generate_database(num_doctors, num_patients, num_appointments, seed=None, reference_date=None, skew=None):
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(seed)
+    pools = build_pools(seed)
+    context = {
+        'sizes': {'doctors': num_doctors, 'patients': num_patients},
+        'reference_date': reference_date,
+        'seed': seed,
+        'skew': skew or {},
+    }
+    doctors = generate_doctors(num_doctors, rng, pools, seed=seed)
+    patients = generate_patients(num_patients, rng, pools, reference_date=reference_date)
+    appointments = generate_appointments(num_appointments, num_doctors, num_patients, rng,
+                                         reference_date=reference_date, context=context)
 
     # Zapisanie danych do plików CSV
     save_to_csv(doctors, 'doctors.csv')
@@ -97,6 +289,7 @@ if __name__ == "__main__":
     num_doctors = int(input("How many doctors to generate? "))
     num_patients = int(input("How many patients to generate? "))
     num_appointments = int(input("How many appointments to generate? "))
+    seed = input("Random seed (empty for a random one)? ").strip()
 
-    generate_database(num_doctors, num_patients, num_appointments)
-    print("Data was generated and saved to CSV files.")
\ No newline at end of file
+    generate_database(num_doctors, num_patients, num_appointments, seed=int(seed) if seed else None)
+    print("Data was generated and saved to CSV files.")
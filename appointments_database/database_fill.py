@@ -1,7 +1,6 @@
-import pandas as pd
+import psycopg2
 from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy.exc import SQLAlchemyError
 
 # Połączenie do bazy danych PostgreSQL
 username = 'postgres'
@@ -61,14 +60,22 @@ doctors_csv_path = 'D:\\data_mining\\doctors.csv'
 patients_csv_path = 'D:\\data_mining\\patients.csv'
 appointments_csv_path = 'D:\\data_mining\\appointments.csv'
 
-# Funkcja do importu danych
+# Funkcja do importu danych: COPY ... FROM STDIN strumieniuje plik bez wczytywania go do pamięci
+# (duże, pofragmentowane zbiory z dataset_generator.py ładuje równolegle bulk_loader.py)
 def import_data_to_table(csv_path, table_name):
+    conn = engine.raw_connection()
     try:
-        df = pd.read_csv(csv_path)
-        df.to_sql(table_name, engine, if_exists='append', index=False)
-        print(f"Dane zostały zaimportowane do tabeli '{table_name}'.")
-    except SQLAlchemyError as e:
+        with open(csv_path, encoding='utf-8') as f, conn.cursor() as cursor:
+            columns = f.readline().strip()
+            cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", f)
+            rows = cursor.rowcount
+        conn.commit()
+        print(f"Dane zostały zaimportowane do tabeli '{table_name}' ({rows} wierszy).")
+    except (OSError, psycopg2.Error) as e:
+        conn.rollback()
         print(f"Wystąpił błąd podczas importowania danych do tabeli '{table_name}': {e}")
+    finally:
+        conn.close()
 
 # Import danych do każdej tabeli
 import_data_to_table(doctors_csv_path, 'doctors')
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""asyncio execution engine for the checkout workloads.
+
+PostgreSQL runs through asyncpg, MongoDB through the PyMongo async API (AsyncMongoClient),
+falling back to motor. Two modes:
+    measure - same per-query measurement and result.txt output as the synchronous
+              measure_query_performance, so sync-vs-async client overhead can be compared
+    load    - thousands of concurrent in-flight queries from one process; at most pool_size of
+              them hold a connection, the rest wait for one. That wait is reported as
+              acquire_wait_*_ms, separately from the query latency
+
+Example:
+    python async_benchmark.py measure --workload clinic --engine postgresql
+    python async_benchmark.py load --workload trip --engine mongodb --concurrency 2000 --duration 30
+    python async_benchmark.py load --workload clinic --engine postgresql --concurrency 200 --pool-size 200
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import time
+
+from benchmark_registry import DATASETS, ENGINES, get_workload
+from benchmark_core import measure, report_results, report_setup, start_section, write_section_line
+from db_connections import MONGO_MAX_POOL_SIZE, PG_POOL_SIZE
+from load_test import LOAD_RESULTS_FILE, load_workload, print_records, query_label, summarize_results
+from mongo_operations import build_cursor, record_operation
+from query_statistics import percentile
+
+# Domyślny rozmiar puli po stronie sterownika (nie większy niż współbieżność testu);
+# współbieżne zapytania ponad pulę czekają na połączenie
+ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', '50'))
+
+async def _to_list(cursor):
+    if inspect.isawaitable(cursor):
+        cursor = await cursor
+    return await cursor.to_list(None)
+
+
+async def replay(operation, collection):
+    """Runs a synchronous 'operation' lambda against an async collection."""
+    return await _to_list(build_cursor(collection, record_operation(operation)))
+
+
+class _AsyncBackend:
+    """Setup bookkeeping shared with the synchronous connectors (see benchmark_core.report_setup)."""
+    mode = 'async'
+    setup_time = 0.0
+    first_connection_time = 0.0
+
+    def describe_setup(self):
+        # Pula asynchroniczna tworzy i łączy klienta w jednym kroku
+        return (
+            f"Client setup: {self.setup_time:.4f} s, first connection: {self.first_connection_time:.4f} s "
+            f"(pool {self.pool_size}-{self.pool_size})\n"
+        )
+
+
+class AsyncPostgresBackend(_AsyncBackend):
+    def __init__(self, config, pool_size=None):
+        self.config = config
+        self.pool_size = pool_size or ASYNC_POOL_SIZE
+        self.pool = None
+
+    async def open(self):
+        import asyncpg
+
+        start_time = time.perf_counter()
+        self.pool = await asyncpg.create_pool(
+            database=self.config['dbname'],
+            user=self.config['user'],
+            password=self.config['password'],
+            host=self.config['host'],
+            port=int(self.config['port']) if self.config['port'] else None,
+            min_size=self.pool_size,
+            max_size=self.pool_size,
+        )
+        self.setup_time = self.first_connection_time = time.perf_counter() - start_time
+        return self.setup_time
+
+    async def close(self):
+        await self.pool.close()
+
+    async def run_query(self, query, sampler=None):
+        """Runs the query and returns the time spent waiting for a pooled connection."""
+        start_time = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            acquire_wait = time.perf_counter() - start_time
+            if sampler is not None:
+                sampler.record_phase('connect', acquire_wait)
+            await conn.fetch(query)
+        return acquire_wait
+
+
+class AsyncMongoBackend(_AsyncBackend):
+    def __init__(self, uri, database_name, pool_size=None):
+        self.uri = uri
+        self.database_name = database_name
+        self.pool_size = pool_size or ASYNC_POOL_SIZE
+        self.client = None
+        self.slots = None
+
+    def _create_client(self):
+        try:
+            from pymongo import AsyncMongoClient
+        except ImportError:
+            from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+        return AsyncMongoClient(self.uri, maxPoolSize=self.pool_size, minPoolSize=min(self.pool_size, 10))
+
+    async def open(self):
+        start_time = time.perf_counter()
+        self.client = self._create_client()
+        # Sterownik nie ujawnia czasu oczekiwania na połączenie z puli - semafor o rozmiarze puli
+        # ogranicza operacje w toku tak samo i pozwala ten czas zmierzyć
+        self.slots = asyncio.Semaphore(self.pool_size)
+        await self.client.admin.command('ping')
+        self.setup_time = self.first_connection_time = time.perf_counter() - start_time
+        return self.setup_time
+
+    async def close(self):
+        result = self.client.close()
+        if inspect.isawaitable(result):
+            await result
+
+    async def run_query(self, query, sampler=None):
+        """Runs the query and returns the time spent waiting for a free pool slot."""
+        start_time = time.perf_counter()
+        async with self.slots:
+            acquire_wait = time.perf_counter() - start_time
+            if sampler is not None:
+                sampler.record_phase('connect', acquire_wait)
+            collection = self.client[self.database_name][query['collection']]
+            if 'pipeline' in query:
+                await _to_list(collection.aggregate(query['pipeline']))
+            elif 'operation' in query:
+                await replay(query['operation'], collection)
+        return acquire_wait
+
+
+def create_backend(module, engine, pool_size=None):
+    if engine == 'postgresql':
+        return AsyncPostgresBackend(module.DATABASE_CONFIG, pool_size)
+    return AsyncMongoBackend(module.MONGODB_URI, module.DATABASE_NAME, pool_size)
+
+
+def run_measure(workload, engine):
+    """Per-query measurement through the async driver, written to result.txt like the sync scripts.
+
+    The pool has the size of the synchronous connector's pool, so client setup and first-connection
+    times are comparable; records carry connection_mode 'async'.
+    """
+    module = load_workload(workload, engine)
+    backend = create_backend(module, engine, PG_POOL_SIZE if engine == 'postgresql' else MONGO_MAX_POOL_SIZE)
+    database = module.DATABASE_CONFIG['dbname'] if engine == 'postgresql' else module.DATABASE_NAME
+    engine_label = 'PostgreSQL' if engine == 'postgresql' else 'MongoDB'
+    # Nagłówek sekcji w result.txt zgodny z nagłówkiem skryptu synchronicznego z rejestru
+    section = get_workload(workload, 'postgresql')['section'] + (" (async)" if engine == 'postgresql' else " (MongoDB async)")
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(backend.open())
+        start_section(workload, section)
+        report_setup(backend)
+        for query in module.queries:
+            measurement = measure(lambda sampler: loop.run_until_complete(backend.run_query(query, sampler)))
+            label = f" {query['name']}" if engine == 'mongodb' else f"\n{query}"
+            report_results(label, database, engine_label, measurement, backend.mode)
+        write_section_line("==========\n")
+    finally:
+        loop.run_until_complete(backend.close())
+        loop.close()
+
+
+async def _load_client(backend, queries, query_indexes, deadline, position, results, waits):
+    while time.perf_counter() < deadline:
+        index = query_indexes[position % len(query_indexes)]
+        position += 1
+        start_time = time.perf_counter()
+        error = None
+        acquire_wait = 0.0
+        try:
+            acquire_wait = await backend.run_query(queries[index])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        # Latencja zapytania bez oczekiwania na połączenie - to raportowane osobno
+        results.append((index, time.perf_counter() - start_time - acquire_wait, error))
+        waits.append((index, acquire_wait))
+
+
+async def _run_load(backend, queries, query_indexes, concurrency, duration):
+    await backend.open()
+    results = []
+    waits = []
+    try:
+        start_time = time.perf_counter()
+        deadline = start_time + duration
+        await asyncio.gather(*(
+            _load_client(backend, queries, query_indexes, deadline, client_id, results, waits)
+            for client_id in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start_time
+    finally:
+        await backend.close()
+    return results, waits, elapsed
+
+
+def summarize_waits(waits):
+    values = [wait for _, wait in waits]
+    if not values:
+        return {}
+    return {
+        'acquire_wait_p50_ms': percentile(values, 50) * 1000,
+        'acquire_wait_p95_ms': percentile(values, 95) * 1000,
+        'acquire_wait_p99_ms': percentile(values, 99) * 1000,
+        'acquire_wait_max_ms': max(values) * 1000,
+    }
+
+
+def run_async_load(workload, engine, concurrency, duration=30.0, query_index=None, pool_size=None):
+    """Closed-loop load with `concurrency` in-flight coroutines; records match load_test.run_load.
+
+    At most pool_size queries (default: ASYNC_POOL_SIZE, capped at concurrency) hold a connection
+    at a time; latencies exclude the wait for one, which is summarized as acquire_wait_*_ms.
+    """
+    module = load_workload(workload, engine)
+    pool_size = pool_size or min(concurrency, ASYNC_POOL_SIZE)
+    backend = create_backend(module, engine, pool_size)
+    query_indexes = [query_index] if query_index is not None else list(range(len(module.queries)))
+
+    results, waits, elapsed = asyncio.run(
+        _run_load(backend, module.queries, query_indexes, concurrency, duration))
+
+    base = {
+        'workload': workload,
+        'engine': engine,
+        'mode': 'closed',
+        'clients': concurrency,
+        'pool_size': pool_size,
+        'target_qps': None,
+        'workers': 'asyncio',
+        'duration_s': elapsed,
+    }
+    records = []
+    for index in query_indexes:
+        per_query = [r for r in results if r[0] == index]
+        records.append({**base, 'query': query_label(module.queries[index]),
+                        **summarize_results(per_query, elapsed),
+                        **summarize_waits([w for w in waits if w[0] == index])})
+    records.append({**base, 'query': 'TOTAL', **summarize_results(results, elapsed), **summarize_waits(waits)})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio execution engine for the checkout workloads.")
+    parser.add_argument('command', choices=['measure', 'load'])
+    parser.add_argument('--workload', choices=DATASETS, required=True)
+    parser.add_argument('--engine', choices=ENGINES, required=True)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[100, 1000],
+                        help="in-flight query counts to run (load)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per load level (load)")
+    parser.add_argument('--query', type=int, help="run only this query (index in the queries list)")
+    parser.add_argument('--pool-size', type=int,
+                        help=f"connections per load level (default: ASYNC_POOL_SIZE={ASYNC_POOL_SIZE}, "
+                             f"at most the concurrency)")
+    args = parser.parse_args()
+
+    if args.command == 'measure':
+        run_measure(args.workload, args.engine)
+        return
+
+    for concurrency in args.concurrency:
+        print(f"Running asyncio load with {concurrency} in-flight queries for {args.duration:.0f} s...")
+        records = run_async_load(args.workload, args.engine, concurrency, args.duration, args.query,
+                                 args.pool_size)
+        print_records(records)
+        with open(LOAD_RESULTS_FILE, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {LOAD_RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+
+import result_store
+from query_statistics import summarize
+from resource_sampler import ResourceSampler
+
+# Czytelny dla człowieka log wyników; dane do analizy trafiają do result_store
+RESULT_FILE = "result.txt"
+
+# Przebiegi rozgrzewkowe (niemierzone) i mierzone dla każdego zapytania
+WARMUP_ITERATIONS = int(os.getenv('BENCH_WARMUP', '0'))
+MEASURED_ITERATIONS = int(os.getenv('BENCH_ITERATIONS', '1'))
+
+# Metryki zasobów uśredniane między iteracjami; maksima brane jako maksimum ze wszystkich iteracji
+_MEAN_FIELDS = ['avg_cpu', 'avg_process_cpu', 'avg_ram', 'io_read_mb', 'io_write_mb', 'ctx_switches',
+                'connect_time']
+_MAX_FIELDS = ['max_cpu', 'max_process_cpu', 'max_ram']
+_SERVER_FIELDS = ['cpu_time', 'rss_delta_mb', 'max_rss_mb', 'read_mb', 'write_mb', 'page_faults']
+
+# Pola podsumowania zapisywane wprost jako kolumny rekordu wyniku
+_RECORD_FIELDS = ['execution_time', 'avg_ram', 'max_ram', 'avg_cpu', 'max_cpu', 'avg_process_cpu',
+                  'max_process_cpu', 'io_read_mb', 'io_write_mb', 'ctx_switches', 'samples', 'interval_ms',
+                  'iterations', 'warmup', 'connect_time']
+_PLAN_FIELDS = ['planning_ms', 'execution_ms', 'rows_examined', 'rows_returned', 'buffer_hits', 'buffer_reads']
+
+# Bieżąca sekcja (zbiór danych + silnik) ustawiana przez start_section w main() skryptu checkout
+_section = {'dataset': None, 'section': None, 'query_index': 0, 'setup': {}}
+
+
+def measure_once(execute):
+    """Runs execute(sampler) under a background ResourceSampler and returns (summary, series).
+
+    execute may attach a database server process to the sampler and record phases such as
+    'connect'; phase time is excluded from the execution time and reported on its own, and the
+    server metrics are returned under summary['server'].
+    """
+    with ResourceSampler() as sampler:
+        start_time = time.perf_counter()
+        execute(sampler)
+        end_time = time.perf_counter()
+
+    summary = sampler.summary()
+    summary['execution_time'] = end_time - start_time - sum(sampler.phases.values())
+    summary['connect_time'] = sampler.phases.get('connect', 0.0)
+    summary['server'] = sampler.server_summary()
+    series = {'client': sampler.series, 'server': sampler.server_series}
+    return summary, series
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _aggregate_server(servers):
+    servers = [s for s in servers if s]
+    if not servers:
+        return None
+    aggregated = {'name': servers[-1]['name'], 'pid': servers[-1]['pid']}
+    for field in _SERVER_FIELDS:
+        aggregated[field] = _mean([s[field] for s in servers])
+    return aggregated
+
+
+def measure(execute, warmup=None, iterations=None):
+    """Runs warmup + measured iterations of execute(sampler) and returns (summary, series).
+
+    summary['execution_time'] is the median of the measured iterations and summary['timing']
+    holds the full statistics; resource metrics are per-iteration means (peaks are maxima).
+    Series points carry the iteration number they belong to.
+    """
+    warmup = WARMUP_ITERATIONS if warmup is None else warmup
+    iterations = MEASURED_ITERATIONS if iterations is None else iterations
+
+    # Rozgrzewka: wypełnienie cache bazy i klienta, bez zapisywania wyników
+    for _ in range(warmup):
+        measure_once(execute)
+
+    runs = [measure_once(execute) for _ in range(max(iterations, 1))]
+    summaries = [summary for summary, _ in runs]
+
+    times = [s['execution_time'] for s in summaries]
+    timing = summarize(times)
+    summary = {
+        'execution_time': timing['median'],
+        'timing': timing,
+        'times': times,
+        'iterations': len(runs),
+        'warmup': warmup,
+        'samples': sum(s['samples'] for s in summaries),
+        'interval_ms': summaries[0]['interval_ms'],
+        'server': _aggregate_server([s['server'] for s in summaries]),
+    }
+    for field in _MEAN_FIELDS:
+        summary[field] = _mean([s[field] for s in summaries])
+    for field in _MAX_FIELDS:
+        summary[field] = max(s[field] for s in summaries)
+
+    series = {'client': [], 'server': []}
+    for iteration, (_, run_series) in enumerate(runs, start=1):
+        for key in series:
+            series[key].extend(dict(point, iteration=iteration) for point in run_series[key])
+    return summary, series
+
+
+def _format_optional(value, fmt):
+    return "n/a" if value is None else format(value, fmt)
+
+
+def format_plan_lines(plan):
+    lines = (
+        f"Server plan: planning {_format_optional(plan['planning_ms'], '.4f')} ms, "
+        f"execution {_format_optional(plan['execution_ms'], '.4f')} ms, "
+        f"rows examined {_format_optional(plan['rows_examined'], '.0f')}, "
+        f"rows returned {_format_optional(plan['rows_returned'], '.0f')}, "
+        f"buffer hits {_format_optional(plan['buffer_hits'], '.0f')}, "
+        f"buffer reads {_format_optional(plan['buffer_reads'], '.0f')}, "
+        f"indexes: {', '.join(plan['indexes']) or 'none'}\n"
+    )
+    if plan['lookups']:
+        lookup_time = sum(lookup['time_ms'] or 0 for lookup in plan['lookups'])
+        lines += f"Lookup stages: {len(plan['lookups'])}, lookup time: {lookup_time:.4f} ms\n"
+    return lines
+
+
+def format_server_line(server):
+    return (
+        f"Server process: {server['name']} (pid {server['pid']}), "
+        f"CPU time: {_format_optional(server['cpu_time'], '.4f')} s, "
+        f"RSS delta: {_format_optional(server['rss_delta_mb'], '.4f')} MB, "
+        f"Read: {_format_optional(server['read_mb'], '.4f')} MB, "
+        f"Write: {_format_optional(server['write_mb'], '.4f')} MB, "
+        f"Page faults: {_format_optional(server['page_faults'], '.0f')}\n"
+    )
+
+
+def write_section_line(text):
+    """Appends a free-form line (section header, setup cost) to result.txt and the console."""
+    print(text)
+    with open(RESULT_FILE, "a") as f:
+        f.write(text)
+
+
+def start_section(dataset, section):
+    """Starts a result.txt section ("DATABASE <section>") and keys the following records by dataset."""
+    _section.update(dataset=dataset, section=section, query_index=0, setup={})
+    write_section_line(f"DATABASE {section}\n\n")
+
+
+def report_setup(connector):
+    """Writes the connector's one-off setup cost and attaches it to the section's records."""
+    write_section_line(connector.describe_setup())
+    if connector.mode != 'cold':
+        _section['setup'] = {
+            'client_setup_s': connector.setup_time,
+            'first_connection_s': connector.first_connection_time,
+        }
+
+
+def format_timing_lines(summary):
+    timing = summary['timing']
+    return (
+        f"Iterations: {summary['iterations']}, warmup: {summary['warmup']}\n"
+        f"Time statistics: min {timing['min']:.6f} s, median {timing['median']:.6f} s, "
+        f"mean {timing['mean']:.6f} s, p95 {timing['p95']:.6f} s, p99 {timing['p99']:.6f} s, "
+        f"std {timing['std']:.6f} s, CI95 [{timing['ci_low']:.6f}, {timing['ci_high']:.6f}] s\n"
+    )
+
+
+def report_results(label, database, engine, measurement, connection_mode=None, plan=None):
+    """Prints the measurement, appends it to result.txt and stores it as a typed record.
+
+    plan is the optional server-side execution plan summary (query_plans.explain_*); the full
+    plan goes to the store's plans table.
+    """
+    summary, series = measurement
+
+    results = (
+        f"Results for query:{label}\n"
+        f"Completion time: {summary['execution_time']:.4f} s\n"
+        f"Average RAM usage: {summary['avg_ram']:.4f} MB, Maximum RAM usage: {summary['max_ram']:.4f} MB\n"
+        f"Average CPU performance: {summary['avg_cpu']:.4f}%, Maximum CPU performance: {summary['max_cpu']:.4f}%\n"
+        f"Average process CPU: {summary['avg_process_cpu']:.4f}%, Maximum process CPU: {summary['max_process_cpu']:.4f}%\n"
+        f"I/O read: {summary['io_read_mb']:.4f} MB, I/O write: {summary['io_write_mb']:.4f} MB, "
+        f"Context switches: {summary['ctx_switches']:.0f}\n"
+        f"Samples: {summary['samples']}, interval: {summary['interval_ms']:.1f} ms\n"
+    )
+    results += format_timing_lines(summary)
+    if connection_mode:
+        results += f"Connect time: {summary['connect_time']:.6f} s ({connection_mode})\n"
+    if summary['server']:
+        results += format_server_line(summary['server'])
+    if plan:
+        results += format_plan_lines(plan)
+
+    # Wyświetlenie wyników na konsoli
+    print(results)
+
+    # Zapisanie wyników do pliku
+    with open(RESULT_FILE, "a") as f:
+        f.write(results + "\n")
+
+    store_results(label, database, engine, measurement, connection_mode, plan)
+
+
+def store_results(label, database, engine, measurement, connection_mode=None, plan=None):
+    """Appends the typed result record, its sampler series and plan to the result store."""
+    summary, series = measurement
+    _section['query_index'] += 1
+    engine_key = engine.lower()
+    key = {
+        'run_id': result_store.RUN_ID,
+        'dataset': _section['dataset'],
+        'engine': engine_key,
+        'section': _section['section'],
+        'query_index': _section['query_index'],
+        'query': label.strip(),
+    }
+
+    record = {
+        **key,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'database': database,
+        'connection_mode': connection_mode,
+        'client_setup_s': _section['setup'].get('client_setup_s'),
+        'first_connection_s': _section['setup'].get('first_connection_s'),
+    }
+    for field in _RECORD_FIELDS:
+        record[field] = summary[field]
+    for field, value in summary['timing'].items():
+        record[f"time_{field}"] = value
+    record['iteration_times'] = summary['times']
+
+    server = summary['server'] or {}
+    record['server_name'] = server.get('name')
+    record['server_pid'] = server.get('pid')
+    for field in _SERVER_FIELDS:
+        record[f"server_{field}"] = server.get(field)
+
+    plan = plan or {}
+    for field in _PLAN_FIELDS:
+        record[f"plan_{field}"] = plan.get(field)
+    record['plan_indexes'] = ', '.join(plan['indexes']) if plan else None
+    lookups = plan.get('lookups') or []
+    record['plan_lookup_stages'] = len(lookups) if plan else None
+    record['plan_lookup_ms'] = sum(lookup['time_ms'] or 0 for lookup in lookups) if lookups else None
+
+    dataset = _section['dataset'] or 'unknown'
+    result_store.append('results', dataset, engine_key, [record])
+    result_store.append('timeseries', dataset, engine_key, [
+        {**key, 'source': source, **point}
+        for source, points in (('client', series['client']), ('server', series['server']))
+        for point in points
+    ])
+    if plan:
+        # Pełny plan jako tekst JSON - struktura różni się między silnikami i wersjami
+        result_store.append('plans', dataset, engine_key, [{**key, 'plan': json.dumps(plan, default=str)}])
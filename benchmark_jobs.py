@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""Background benchmark jobs for the web API (POST /runs).
+
+Jobs are kept in a SQLite table, so every gunicorn worker sees the same queue, status and
+cancellation flags. Each worker runs a small pool of dispatcher threads that claim queued jobs
+while fewer than MAX_RUNNING_JOBS are running across all workers. A job runs as a child
+process with its own result_store run id and output files:
+    measure - run_all_checkout.py with BENCH_ITERATIONS / BENCH_WARMUP for the chosen suites
+    load    - load_test.py at the requested concurrency for every chosen (dataset, engine)
+"""
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import result_store
+from benchmark_registry import DATASETS, ENGINES, select_workloads
+
+JOBS_DB = os.getenv('JOBS_DB', 'benchmark_jobs.sqlite')
+
+# Benchmarki uruchomione jednocześnie zakłócają sobie pomiary - domyślnie jeden naraz
+MAX_RUNNING_JOBS = int(os.getenv('MAX_RUNNING_JOBS', '1'))
+
+# Co ile sekund wątki sprawdzają kolejkę i flagę anulowania
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '1.0'))
+
+# Zadanie 'running' bez odświeżonego heartbeat_at przez tyle sekund uznajemy za osierocone
+# (worker zakończony lub na innej maszynie); wątek odświeża go przy każdym sprawdzeniu
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+
+MAX_ITERATIONS = 1000
+MAX_CONCURRENCY = 1024
+MAX_DURATION = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER,
+    heartbeat_at REAL,
+    returncode INTEGER,
+    error TEXT
+);
+"""
+
+# Kolumny dodane po pierwszej wersji tabeli - dopisywane do istniejących plików JOBS_DB
+_ADDED_COLUMNS = {'heartbeat_at': 'REAL'}
+
+
+def connect():
+    # isolation_level=None - transakcje sterowane jawnie (BEGIN IMMEDIATE przy przydzielaniu zadań)
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, column_type in _ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+    return conn
+
+
+def _as_list(value, allowed, name):
+    if value is None:
+        return list(allowed)
+    values = [value] if isinstance(value, str) else list(value)
+    invalid = [v for v in values if v not in allowed]
+    if invalid or not values:
+        raise ValueError(f"Unknown {name}: {', '.join(map(str, invalid)) or 'empty list'}")
+    return values
+
+
+def _bounded_int(spec, name, default, low, high):
+    value = spec.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise ValueError(f"{name} must be an integer between {low} and {high}")
+    return value
+
+
+def _bounded_float(spec, name, default, low, high):
+    value = spec.get(name, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not low < value <= high:
+        raise ValueError(f"{name} must be a number greater than {low} and at most {high}")
+    return float(value)
+
+
+def _boolean(spec, name, default):
+    value = spec.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false")
+    return value
+
+
+def validate_spec(spec):
+    """Normalizes a POST /runs body; raises ValueError for invalid input."""
+    if not isinstance(spec, dict):
+        raise ValueError("Request body must be a JSON object")
+    normalized = {
+        'datasets': _as_list(spec.get('datasets', spec.get('dataset')), DATASETS, 'dataset'),
+        'engines': _as_list(spec.get('engines', spec.get('engine')), ENGINES, 'engine'),
+        'iterations': _bounded_int(spec, 'iterations', 1, 1, MAX_ITERATIONS),
+        'warmup': _bounded_int(spec, 'warmup', 0, 0, MAX_ITERATIONS),
+        'concurrency': _bounded_int(spec, 'concurrency', 1, 1, MAX_CONCURRENCY),
+        'duration': _bounded_float(spec, 'duration', 30.0, 0, MAX_DURATION),
+        'parallel': _boolean(spec, 'parallel', False),
+    }
+    # Współbieżność > 1 to test obciążenia; 1 to zwykły pomiar zapytań
+    normalized['kind'] = 'load' if normalized['concurrency'] > 1 else 'measure'
+    return normalized
+
+
+def _job_dict(row):
+    job = dict(row)
+    job['spec'] = json.loads(job['spec'])
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+
+def submit(spec):
+    spec = validate_spec(spec)
+    job_id = uuid.uuid4().hex[:12]
+    run_id = f"job-{job_id}"
+    conn = connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, spec, run_id, created_at) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, json.dumps(spec), run_id, time.time()),
+        )
+        return get_job(job_id, conn)
+    finally:
+        conn.close()
+
+
+def get_job(job_id, conn=None):
+    own = conn is None
+    conn = conn or connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+    finally:
+        if own:
+            conn.close()
+
+
+def get_job_by_run(run_id):
+    """The job that writes result_store run run_id, or None for runs started outside the job API."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        return _job_dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def list_jobs(limit=100):
+    conn = connect()
+    try:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def cancel(job_id):
+    """Cancels a queued job at once; a running job is stopped by its dispatcher thread."""
+    conn = connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+        return get_job(job_id, conn)
+    finally:
+        conn.close()
+
+
+def job_dir(job):
+    # Ścieżka bezwzględna - procesy potomne działają w katalogu repozytorium
+    return os.path.abspath(result_store.run_dir(job['run_id']))
+
+
+def load_output_file(job):
+    return os.path.join(job_dir(job), "load_results.jsonl")
+
+
+def job_commands(job):
+    """Child process command lines of a job, run one after another."""
+    spec = job['spec']
+    if spec['kind'] == 'measure':
+        command = [sys.executable, 'run_all_checkout.py', '--datasets', *spec['datasets'],
+                   '--engines', *spec['engines'],
+                   '--output', os.path.join(job_dir(job), 'comparison.xlsx')]
+        if spec['parallel']:
+            command.append('--parallel')
+        return [command]
+    return [
+        [sys.executable, 'load_test.py', '--workload', workload['dataset'], '--engine', workload['engine'],
+         '--clients', str(spec['concurrency']), '--duration', str(spec['duration']),
+         '--output', load_output_file(job)]
+        for workload in select_workloads(spec['datasets'], spec['engines'])
+    ]
+
+
+def _job_environment(job):
+    env = dict(os.environ)
+    env.update({
+        'BENCH_RUN_ID': job['run_id'],
+        'RESULTS_DIR': os.path.abspath(result_store.RESULTS_DIR),
+        'BENCH_ITERATIONS': str(job['spec']['iterations']),
+        'BENCH_WARMUP': str(job['spec']['warmup']),
+    })
+    return env
+
+
+def _claim_next(conn):
+    """Atomically moves the oldest queued job to 'running' if the global limit allows it."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Zadania osierocone: właściciel przestał odświeżać heartbeat (PID nie mówi nic o innym
+        # kontenerze i bywa ponownie przydzielany)
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'worker stopped sending heartbeats' "
+            "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+            (now, now - JOB_LEASE_SECONDS),
+        )
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+        row = None
+        if running < MAX_RUNNING_JOBS:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, owner_pid = ? "
+                    "WHERE job_id = ?", (now, now, os.getpid(), row['job_id']),
+                )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return get_job(row['job_id'], conn) if row is not None else None
+
+
+def _heartbeat(conn, job_id):
+    """Renews the job's lease and returns whether cancellation was requested."""
+    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+    return bool(conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0])
+
+
+def _signal_group(process, signum):
+    try:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def _stop(process):
+    """Stops the child and everything it started (e.g. the --parallel suite workers)."""
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+    # SIGKILL dla całej grupy także po wyjściu lidera - jego procesy potomne mogły jeszcze działać
+    _signal_group(process, signal.SIGKILL)
+    process.wait()
+
+
+def execute(job, conn):
+    """Runs the job's commands; returns (status, returncode, error)."""
+    os.makedirs(job_dir(job), exist_ok=True)
+    log_path = os.path.join(job_dir(job), "job.log")
+    env = _job_environment(job)
+    returncode = 0
+    with open(log_path, "a") as log:
+        for command in job_commands(job):
+            # Własna grupa procesów - anulowanie zatrzymuje też procesy potomne dziecka
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True)
+            while True:
+                try:
+                    returncode = process.wait(timeout=JOB_POLL_SECONDS)
+                    break
+                except subprocess.TimeoutExpired:
+                    try:
+                        cancel_requested = _heartbeat(conn, job['job_id'])
+                    except sqlite3.Error as e:
+                        # Zablokowana baza zadań nie przerywa działającego benchmarku - ponowna próba za chwilę
+                        print(f"Heartbeat of job {job['job_id']} failed: {type(e).__name__}: {e}")
+                        _rollback(conn)
+                        continue
+                    if cancel_requested:
+                        _stop(process)
+                        return 'cancelled', None, None
+            if returncode != 0:
+                return 'failed', returncode, f"{os.path.basename(command[1])} exited with code {returncode}"
+    return 'succeeded', returncode, None
+
+
+def _rollback(conn):
+    if conn.in_transaction:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+
+
+def _finish(conn, job_id, status, returncode, error):
+    """Stores the job's final status, retrying until it succeeds - a finished job must not stay 'running'."""
+    while True:
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, returncode = ?, error = ? WHERE job_id = ?",
+                (status, time.time(), returncode, error, job_id),
+            )
+            return
+        except sqlite3.Error as e:
+            print(f"Could not store the status of job {job_id}, retrying: {type(e).__name__}: {e}")
+            _rollback(conn)
+            time.sleep(JOB_POLL_SECONDS)
+
+
+def _dispatch_forever():
+    conn = connect()
+    while True:
+        # Błąd jednej iteracji (np. 'database is locked') nie może zatrzymać wątku - nikt go nie wznowi
+        try:
+            job = _claim_next(conn)
+        except Exception as e:
+            print(f"Job dispatcher could not claim a job: {type(e).__name__}: {e}")
+            _rollback(conn)
+            job = None
+        if job is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        try:
+            status, returncode, error = execute(job, conn)
+        except Exception as e:
+            status, returncode, error = 'failed', None, f"{type(e).__name__}: {e}"
+        _finish(conn, job['job_id'], status, returncode, error)
+
+
+_runner_lock = threading.Lock()
+_runner_pid = None
+
+
+def ensure_runner():
+    """Starts this process's dispatcher threads once (again after a fork)."""
+    global _runner_pid
+    if _runner_pid == os.getpid():
+        return
+    with _runner_lock:
+        if _runner_pid == os.getpid():
+            return
+        for _ in range(MAX_RUNNING_JOBS):
+            threading.Thread(target=_dispatch_forever, name="benchmark-job-dispatcher", daemon=True).start()
+        _runner_pid = os.getpid()
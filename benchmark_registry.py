@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import importlib
+
+# Deklaratywny rejestr obciążeń: zbiór danych, silnik, moduł z listą `queries` i nagłówek sekcji w result.txt.
+# Kolejność ma znaczenie - najpierw PostgreSQL, potem MongoDB: w tej kolejności uruchamiane są zestawy
+# i zapisywane sekcje result.txt. Rekordy są kluczowane sekcją i numerem zapytania w sekcji (query_index,
+# benchmark_core.store_results), a run_all_checkout.number_queries numeruje je w tym samym porządku.
+WORKLOADS = [
+    {'dataset': 'clinic', 'engine': 'postgresql', 'module': 'appointments_database_checkout', 'section': 'CLINIC'},
+    {'dataset': 'flight', 'engine': 'postgresql', 'module': 'flight_database_checkout', 'section': 'FLIGHT'},
+    {'dataset': 'trip', 'engine': 'postgresql', 'module': 'trip_database_checkout', 'section': 'TRIP'},
+    {'dataset': 'clinic', 'engine': 'mongodb', 'module': 'appointments_MongoDB_checkout', 'section': 'CLINIC (MongoDB)'},
+    {'dataset': 'flight', 'engine': 'mongodb', 'module': 'flight_MongoDB_checkout', 'section': 'FLIGHT (MongoDB)'},
+    {'dataset': 'trip', 'engine': 'mongodb', 'module': 'trip_MongoDB_checkout', 'section': 'TRIP (MongoDB)'},
+]
+
+DATASETS = ['clinic', 'flight', 'trip']
+ENGINES = ['postgresql', 'mongodb']
+
+
+def select_workloads(datasets=None, engines=None):
+    """Registry entries filtered by dataset and engine, in registry order."""
+    return [
+        workload for workload in WORKLOADS
+        if (not datasets or workload['dataset'] in datasets) and (not engines or workload['engine'] in engines)
+    ]
+
+
+def get_workload(dataset, engine):
+    return select_workloads([dataset], [engine])[0]
+
+
+def load_module(workload):
+    """Imports the checkout module of a registry entry (once per interpreter)."""
+    return importlib.import_module(workload['module'])
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""COPY-based bulk loader of generated datasets into PostgreSQL.
+
+Reads a directory written by dataset_generator.py (manifest.json plus CSV/Parquet shards) or
+the flat <table>.csv files of appointments_database/data_generator.py and streams every
+shard with COPY ... FROM STDIN, one shard per worker process. CSV shards are passed to COPY
+as files, Parquet shards are converted batch by batch, so no table is ever held in memory.
+
+Before the load the foreign keys, primary/unique constraints and indexes of the target tables
+are dropped; afterwards they are rebuilt (keys first, then indexes, then foreign keys) and the
+tables analyzed. The dropped definitions are saved in <source>/_dropped_ddl.json until the
+rebuild finishes, so an interrupted load can restore them with --rebuild-only.
+
+Example:
+    python dataset_generator.py clinic --scale-factor 10 --output data/clinic-sf10
+    python bulk_loader.py data/clinic-sf10 --create-schema --truncate
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import psycopg2
+
+from benchmark_registry import get_workload, load_module
+from dataset_generator import GENERATORS, MANIFEST_FILE, load_generator, read_manifest
+
+# Pamięć na budowę indeksów i kluczy po załadowaniu (SET maintenance_work_mem)
+LOAD_MAINTENANCE_WORK_MEM = os.getenv('LOAD_MAINTENANCE_WORK_MEM', '1GB')
+
+# Wiersze jednej porcji przy konwersji Parquet -> CSV dla COPY
+PARQUET_BATCH_ROWS = 100_000
+
+DDL_FILE = "_dropped_ddl.json"
+
+
+def database_config(dataset, dbname=None):
+    config = dict(load_module(get_workload(dataset, 'postgresql')).DATABASE_CONFIG)
+    if dbname:
+        config['dbname'] = dbname
+    return config
+
+
+def source_shards(source, dataset=None):
+    """(dataset, {table: [shard paths]}) of a generated directory, tables in load order."""
+    if os.path.exists(os.path.join(source, MANIFEST_FILE)):
+        manifest = read_manifest(source)
+        if manifest['format'] == 'jsonl':
+            raise SystemExit(f"{source} holds MongoDB documents; generate CSV or Parquet for PostgreSQL")
+        return manifest['dataset'], {
+            table: [os.path.join(source, shard) for shard in info['shards']]
+            for table, info in manifest['tables'].items()
+        }
+    # Płaskie pliki <tabela>.csv z generate_database()
+    if dataset is None:
+        raise SystemExit(f"No {MANIFEST_FILE} in {source}; pass --dataset")
+    tables = load_generator(dataset).SCALE_FACTOR_ROWS
+    return dataset, {
+        table: sorted(glob.glob(os.path.join(source, f"{table}.csv")))
+        for table in tables if os.path.exists(os.path.join(source, f"{table}.csv"))
+    }
+
+
+def create_schema(conn, dataset):
+    schema = getattr(load_generator(dataset), 'POSTGRES_SCHEMA', None)
+    if schema is None:
+        raise SystemExit(f"No POSTGRES_SCHEMA defined for the {dataset} dataset")
+    with conn.cursor() as cursor:
+        cursor.execute(schema)
+    conn.commit()
+
+
+def capture_ddl(conn, tables):
+    """Definitions of the keys, foreign keys and remaining indexes touching the tables."""
+    with conn.cursor() as cursor:
+        # Także klucze obce z innych tabel wskazujące na ładowane tabele - blokowałyby usunięcie PK
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype IN ('p', 'u', 'f') "
+            "AND (conrelid = ANY(%(tables)s::regclass[]) OR confrelid = ANY(%(tables)s::regclass[])) "
+            "ORDER BY conrelid::regclass::text, conname",
+            {'tables': tables},
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index i "
+            "WHERE indrelid = ANY(%(tables)s::regclass[]) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid) "
+            "ORDER BY 1",
+            {'tables': tables},
+        )
+        indexes = cursor.fetchall()
+    return {
+        'keys': [{'table': t, 'name': n, 'definition': d} for t, n, kind, d in constraints if kind in 'pu'],
+        'indexes': [{'name': n, 'definition': d} for n, d in indexes],
+        'foreign_keys': [{'table': t, 'name': n, 'definition': d} for t, n, kind, d in constraints if kind == 'f'],
+    }
+
+
+def referencing_tables(ddl, tables):
+    """Tables outside the loaded set whose foreign keys point at one of the loaded tables."""
+    return sorted({fk['table'] for fk in ddl['foreign_keys'] if fk['table'] not in tables})
+
+
+def drop_ddl(conn, ddl):
+    with conn.cursor() as cursor:
+        for fk in ddl['foreign_keys']:
+            cursor.execute(f'ALTER TABLE {fk["table"]} DROP CONSTRAINT IF EXISTS "{fk["name"]}"')
+        for index in ddl['indexes']:
+            cursor.execute(f"DROP INDEX IF EXISTS {index['name']}")
+        for key in ddl['keys']:
+            cursor.execute(f'ALTER TABLE {key["table"]} DROP CONSTRAINT IF EXISTS "{key["name"]}"')
+    conn.commit()
+
+
+def _run_ddl(config, statement):
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET maintenance_work_mem = %s", (LOAD_MAINTENANCE_WORK_MEM,))
+            start = time.perf_counter()
+            cursor.execute(statement)
+        conn.commit()
+        return statement, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def rebuild_ddl(config, ddl, workers):
+    """Recreates keys, then indexes, then foreign keys; statements of one phase run in parallel."""
+    phases = [
+        [f'ALTER TABLE {key["table"]} ADD CONSTRAINT "{key["name"]}" {key["definition"]}' for key in ddl['keys']],
+        [index['definition'] for index in ddl['indexes']],
+        [f'ALTER TABLE {fk["table"]} ADD CONSTRAINT "{fk["name"]}" {fk["definition"]}' for fk in ddl['foreign_keys']],
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for statements in phases:
+            for statement, elapsed in executor.map(lambda s: _run_ddl(config, s), statements):
+                print(f"  {elapsed:8.2f} s  {statement}")
+
+
+def _copy_shard(task):
+    config, table, path = task
+    conn = psycopg2.connect(**config)
+    start = time.perf_counter()
+    rows = 0
+    try:
+        with conn.cursor() as cursor:
+            if path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+
+                parquet = pq.ParquetFile(path)
+                columns = ", ".join(parquet.schema_arrow.names)
+                for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+                    buffer = io.StringIO()
+                    batch.to_pandas().to_csv(buffer, index=False, header=False)
+                    buffer.seek(0)
+                    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+                    rows += cursor.rowcount
+            else:
+                with open(path, encoding="utf-8") as f:
+                    # Kolumny z nagłówka - kolejność w pliku nie musi odpowiadać tabeli
+                    columns = f.readline().strip()
+                    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", f)
+                    rows = cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return table, path, rows, time.perf_counter() - start
+
+
+def load(source, dataset=None, dbname=None, workers=None, create=False, truncate=False, rebuild_only=False):
+    """Loads a generated directory into PostgreSQL; returns {table: (rows, seconds)}."""
+    dataset, shards = source_shards(source, dataset)
+    config = database_config(dataset, dbname)
+    tables = list(shards)
+    workers = workers or os.cpu_count()
+    ddl_path = os.path.join(source, DDL_FILE)
+
+    conn = psycopg2.connect(**config)
+    try:
+        if create:
+            create_schema(conn, dataset)
+        if rebuild_only and not os.path.exists(ddl_path):
+            print(f"Nothing to rebuild: no {DDL_FILE} in {source}")
+            return {}
+        if os.path.exists(ddl_path):
+            # Poprzednie ładowanie przerwane po usunięciu indeksów - definicje z pliku
+            with open(ddl_path) as f:
+                ddl = json.load(f)
+            print(f"Resuming with the index and key definitions saved in {ddl_path}")
+        else:
+            ddl = capture_ddl(conn, tables)
+        if truncate and not rebuild_only:
+            # Wiersze tabel spoza zestawu wskazywałyby na usunięte klucze - klucz obcy nie dałby się odbudować
+            outside = referencing_tables(ddl, tables)
+            if outside:
+                raise SystemExit(
+                    f"Cannot truncate {', '.join(tables)}: referenced by foreign keys of {', '.join(outside)}, "
+                    f"which are not part of this load. Empty or drop those tables first, or load without --truncate."
+                )
+        if not os.path.exists(ddl_path):
+            with open(ddl_path, "w") as f:
+                json.dump(ddl, f, indent=2)
+        # Najpierw usunięcie kluczy obcych, potem TRUNCATE - inaczej blokują go klucze obce
+        drop_ddl(conn, ddl)
+        if truncate and not rebuild_only:
+            with conn.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {', '.join(tables)}")
+            conn.commit()
+    finally:
+        conn.close()
+
+    stats = {}
+    if not rebuild_only:
+        tasks = [(config, table, path) for table in tables for path in shards[table]]
+        start = time.perf_counter()
+        totals = {table: [0, 0.0] for table in tables}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for table, path, rows, elapsed in executor.map(_copy_shard, tasks):
+                totals[table][0] += rows
+                totals[table][1] += elapsed
+                print(f"{table:<20} {os.path.basename(path):<20} {rows:>12,} rows {rows / elapsed:>12,.0f} rows/s")
+        load_time = time.perf_counter() - start
+        for table, (rows, busy) in totals.items():
+            stats[table] = (rows, busy)
+            print(f"{table}: {rows:,} rows, {rows / busy if busy else 0:,.0f} rows/s per connection")
+        total_rows = sum(rows for rows, _ in totals.values())
+        print(f"COPY: {total_rows:,} rows in {load_time:.1f} s ({total_rows / load_time:,.0f} rows/s, "
+              f"{workers} workers)")
+
+    start = time.perf_counter()
+    print("Rebuilding keys and indexes:")
+    rebuild_ddl(config, ddl, workers)
+    os.remove(ddl_path)
+    conn = psycopg2.connect(**config)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"ANALYZE {', '.join(tables)}")
+    finally:
+        conn.close()
+    print(f"Index rebuild and ANALYZE: {time.perf_counter() - start:.1f} s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="COPY-based bulk loader of generated datasets into PostgreSQL.")
+    parser.add_argument('source', help="directory written by dataset_generator.py or with <table>.csv files")
+    parser.add_argument('--dataset', choices=sorted(GENERATORS), help="dataset of a directory without manifest")
+    parser.add_argument('--dbname', help="target database (default: the dataset's checkout database)")
+    parser.add_argument('--workers', type=int, help="parallel COPY connections (default: CPU count)")
+    parser.add_argument('--create-schema', action='store_true', help="create missing tables first")
+    parser.add_argument('--truncate', action='store_true', help="empty the tables before loading")
+    parser.add_argument('--rebuild-only', action='store_true',
+                        help="only restore keys and indexes saved by an interrupted load")
+    args = parser.parse_args()
+
+    load(args.source, args.dataset, args.dbname, args.workers, args.create_schema, args.truncate, args.rebuild_only)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Data layer of the /compare endpoint: the comparison workbook and its pre-serialized snapshot.
+
+The snapshot (COMPARE_CACHE_FILE) holds the ready JSON body together with the SHA-256 of the
+workbook's content, so it stays valid across checkouts and copies of the same workbook.
+write_snapshot() regenerates it whenever results are published and at build time
+(bin/post_compile), so web workers answer /compare straight from the snapshot and never
+import pandas for it.
+
+Example:
+    python compare_data.py   # rebuild the snapshot next to compare_databases.xlsx
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DATA_FILE = 'compare_databases.xlsx'
+
+# Gotowa odpowiedź /compare zapisana na dysku, współdzielona przez workery gunicorna
+COMPARE_CACHE_FILE = os.getenv('COMPARE_CACHE_FILE', '.compare_cache.json')
+
+# Funkcja do wczytywania danych z Excela (z podanej zawartości pliku albo bezpośrednio z DATA_FILE)
+def load_excel_data(content=None):
+    import pandas as pd
+
+    df = pd.read_excel(DATA_FILE if content is None else io.BytesIO(content))
+    df['source'] = df['Baza danych'].apply(lambda x: 'MongoDB' if 'MongoDB' in str(x) else 'PostgreSQL')
+    df['Zapytanie'] = df['Zapytanie'].fillna("N/A")  # Upewniamy się, że brakujące wartości są uzupełnione
+    postgresql_data = df[df['source'] == 'PostgreSQL']
+    mongodb_data = df[df['source'] == 'MongoDB']
+    return postgresql_data, mongodb_data
+
+# Kolumny zawsze obecne w pliku porównawczym
+BASE_COLUMNS = ['Baza danych', 'Czas wykonania (s)', 'Maksymalna wydajność CPU (%)',
+                'Maksymalne zużycie RAM (MB)', 'Zapytanie',
+                'Średnia wydajność CPU (%)', 'Średnie zużycie RAM (MB)']
+
+# Kolumny z próbkowania w tle (ResourceSampler), obecne tylko w nowszych wynikach
+SAMPLER_COLUMNS = ['Średnie CPU procesu (%)', 'Maksymalne CPU procesu (%)',
+                   'Odczyt I/O (MB)', 'Zapis I/O (MB)', 'Przełączenia kontekstu', 'Liczba próbek']
+
+# Statystyki z wielu iteracji (BENCH_ITERATIONS > 1)
+STATISTICS_COLUMNS = ['Iteracje', 'Rozgrzewka', 'Czas min (s)', 'Czas mediana (s)', 'Czas średni (s)',
+                      'Czas p95 (s)', 'Czas p99 (s)', 'Odchylenie std (s)', 'CI95 dolny (s)', 'CI95 górny (s)']
+
+# Czas nawiązania połączenia mierzony osobno od zapytania
+CONNECTION_COLUMNS = ['Czas połączenia (s)', 'Tryb połączenia', 'Przygotowanie klienta (s)', 'Pierwsze połączenie (s)']
+
+# Koszt po stronie silnika bazy (SERVER_METRICS=1)
+SERVER_COLUMNS = ['Proces serwera', 'CPU serwera (s)', 'Zmiana RAM serwera (MB)',
+                  'Odczyt serwera (MB)', 'Zapis serwera (MB)', 'Błędy stron serwera']
+
+# Plan wykonania po stronie serwera (CAPTURE_PLANS=1)
+PLAN_COLUMNS = ['Planowanie (ms)', 'Wykonanie na serwerze (ms)', 'Wiersze przejrzane', 'Wiersze zwrócone',
+                'Bufory trafione', 'Bufory odczytane', 'Indeksy', 'Etapy $lookup', 'Czas $lookup (ms)']
+
+# Kolumny dołączane do odpowiedzi tylko wtedy, gdy są w pliku
+OPTIONAL_COLUMNS = (SAMPLER_COLUMNS + STATISTICS_COLUMNS + CONNECTION_COLUMNS + SERVER_COLUMNS
+                    + PLAN_COLUMNS)
+
+def select_columns(df):
+    columns = BASE_COLUMNS + [c for c in OPTIONAL_COLUMNS if c in df.columns]
+    selected = df[columns]
+    # Brakujące wartości (np. metryki serwera dla zdalnej bazy) jako null w JSON, nie NaN
+    return selected.astype(object).where(selected.notna(), None).to_dict(orient='records')
+
+def _json_default(value):
+    # Typy NumPy (np. int64, tablice z Parquet) pozostałe po to_dict
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_json(data):
+    """Serializes large record lists with orjson when installed, else the standard json module."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_SORT_KEYS).decode("utf-8") + "\n"
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=_json_default) + "\n"
+
+def build_compare_body(postgresql_data, mongodb_data):
+    response = {
+        'PostgreSQL': select_columns(postgresql_data),
+        'MongoDB': select_columns(mongodb_data)
+    }
+    return dumps_json(response)
+
+# Pamięć podręczna procesu: wpis jednej wersji pliku - klucz (mtime, rozmiar), skrót treści, podzielone dane,
+# gotowe body JSON, jego ETag i skompresowane warianty (tworzone przy pierwszym żądaniu danego kodowania).
+# Wpis nie jest zmieniany po utworzeniu; nowa wersja to nowy słownik podmieniany jednym przypisaniem,
+# więc żądanie trzymające stary wpis nie zapisze swoich danych do nowej wersji
+_entry = {'key': None, 'digest': None, 'frames': None, 'body': None, 'etag': None, 'encoded': {}}
+_cache_lock = threading.Lock()
+
+def compute_etag(body):
+    # ETag z treści odpowiedzi - identyczny we wszystkich workerach dla tych samych danych
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+def _file_key(path):
+    # Tani test zmiany pliku w procesie; migawka na dysku jest kluczowana skrótem treści
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns} {stat.st_size}"
+
+def _read_workbook():
+    """Returns (content, SHA-256 digest) of DATA_FILE, read once so both describe the same version."""
+    with open(DATA_FILE, "rb") as f:
+        content = f.read()
+    return content, hashlib.sha256(content).hexdigest()
+
+def _read_disk_cache(digest):
+    try:
+        with open(COMPARE_CACHE_FILE, "r", encoding="utf-8") as f:
+            if f.readline().rstrip("\n") == digest:
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+def _write_disk_cache(digest, body):
+    # Zapis do pliku tymczasowego i atomowa podmiana - inne workery nigdy nie widzą połowy pliku
+    directory = os.path.dirname(os.path.abspath(COMPARE_CACHE_FILE))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        # Katalog migawki niedostępny - odpowiedź i tak jest w pamięci procesu
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(digest + "\n" + body)
+        os.replace(tmp_path, COMPARE_CACHE_FILE)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_compare_data():
+    """Returns the cache entry for DATA_FILE, re-checking it only when the file's mtime or size changes.
+
+    A changed file is identified by its content hash: an unchanged workbook keeps its entry, and a
+    worker that finds a body for that hash in COMPARE_CACHE_FILE uses it instead of re-parsing the
+    workbook; the parsed frames are then loaded on first use (get_frames).
+    """
+    global _entry
+    key = _file_key(DATA_FILE)
+    entry = _entry
+    if entry['key'] == key:
+        return entry
+    with _cache_lock:
+        entry = _entry
+        if entry['key'] != key:
+            content, digest = _read_workbook()
+            if entry['digest'] == digest:
+                # Ta sama treść pod nowym mtime (np. ponowny checkout) - dane bez zmian
+                entry = dict(entry, key=key)
+            else:
+                body = _read_disk_cache(digest)
+                frames = None
+                if body is None:
+                    frames = load_excel_data(content)
+                    body = build_compare_body(*frames)
+                    _write_disk_cache(digest, body)
+                entry = {'key': key, 'digest': digest, 'frames': frames, 'body': body,
+                         'etag': compute_etag(body), 'encoded': {}}
+            _entry = entry
+    return entry
+
+def get_frames():
+    """Pre-split (PostgreSQL, MongoDB) frames of the current DATA_FILE."""
+    global _entry
+    entry = get_compare_data()
+    if entry['frames'] is not None:
+        return entry['frames']
+    with _cache_lock:
+        if _entry is entry:
+            # Kopia wpisu z wczytanymi danymi - wpis widziany przez inne żądania pozostaje bez zmian
+            _entry = dict(entry, frames=load_excel_data())
+            return _entry['frames']
+    return get_frames()
+
+def write_snapshot():
+    """Rebuilds the /compare snapshot from DATA_FILE (run after publishing new results and at build time)."""
+    content, digest = _read_workbook()
+    body = build_compare_body(*load_excel_data(content))
+    _write_disk_cache(digest, body)
+    return digest
+
+
+if __name__ == '__main__':
+    write_snapshot()
+    print(f"Snapshot of {DATA_FILE} written to {COMPARE_CACHE_FILE}")
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Parallel, chunked generation of benchmark datasets at any scale factor.
+
+Table sizes are the generator module's SCALE_FACTOR_ROWS multiplied by the scale factor (SF 1,
+10, 100 ... like TPC-H). Every table is split into chunks of CHUNK_ROWS rows generated by a
+process pool; each chunk has its own seed derived from (seed, table, chunk index), so the output
+does not depend on the number of workers. Chunks are written straight to shard files, which
+keeps memory flat at a few chunks regardless of the dataset size:
+
+    <output>/<table>/part-00000.csv (.parquet)      for bulk_loader.py (PostgreSQL)
+    <output>/<table>/part-00000.jsonl               MongoDB documents, for mongoimport
+    <output>/manifest.json                          scale factor, seed, row counts and shards
+
+Dimension tables listed in a generator's FIXED_TABLES keep their size at every scale factor
+and are generated as a single chunk. The same seed gives the same rows in every format.
+
+Keys and dates are uniform unless a skew is configured: --skew COLUMN=EXPONENT draws a key
+or category column (e.g. clinic diagnosis, treatment) from a Zipf distribution (1.0 is classic
+Zipf, larger is more skewed), --seasonality adds a yearly wave to the dates and
+--diagnosis-correlation (clinic) ties diagnoses to the doctor's specialization. The
+configuration is recorded in the manifest.
+
+Example:
+    python dataset_generator.py clinic --scale-factor 100 --output data/clinic-sf100 --format parquet
+    python dataset_generator.py trip --scale-factor 10 --format jsonl
+    python dataset_generator.py clinic --skew doctor_id=1.1 --skew patient_id=0.8 --seasonality 0.5
+    python dataset_generator.py clinic --skew diagnosis=1.2 --diagnosis-correlation 0.7
+    mongoimport --db trip --collection trips --file data/trip-sf10-jsonl/trips/part-00000.jsonl
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Moduły generatorów: SCALE_FACTOR_ROWS, build_pools(seed) i generate_chunk(...);
+# opcjonalnie FIXED_TABLES, TIMESTAMP_COLUMNS, SKEWABLE_COLUMNS, SKEW_OPTIONS i POSTGRES_SCHEMA
+GENERATORS = {
+    'clinic': 'appointments_database.data_generator',
+    'flight': 'flight_data_generator',
+    'trip': 'trip_data_generator',
+}
+
+# Liczba wierszy jednego fragmentu (pliku) - wyznacza zużycie pamięci procesu roboczego
+CHUNK_ROWS = int(os.getenv('CHUNK_ROWS', '500000'))
+
+FORMATS = ['csv', 'parquet', 'jsonl']
+
+MANIFEST_FILE = "manifest.json"
+
+
+def load_generator(dataset):
+    return importlib.import_module(GENERATORS[dataset])
+
+
+def table_sizes(generator, scale_factor):
+    fixed = getattr(generator, 'FIXED_TABLES', set())
+    return {
+        table: rows if table in fixed else max(1, round(rows * scale_factor))
+        for table, rows in generator.SCALE_FACTOR_ROWS.items()
+    }
+
+
+def parse_skew(generator, columns=(), seasonality=0.0, diagnosis_correlation=0.0):
+    """Validated skew configuration from COLUMN=EXPONENT strings and the option values."""
+    skewable = getattr(generator, 'SKEWABLE_COLUMNS', {})
+    options = getattr(generator, 'SKEW_OPTIONS', set())
+    skew = {'columns': {}}
+    for item in columns:
+        column, _, exponent = item.partition('=')
+        if column not in skewable:
+            raise ValueError(f"Column {column!r} cannot be skewed; choose from: {', '.join(sorted(skewable))}")
+        try:
+            skew['columns'][column] = float(exponent)
+        except ValueError:
+            raise ValueError(f"Invalid exponent in {item!r}; expected COLUMN=EXPONENT, e.g. doctor_id=1.1")
+        if skew['columns'][column] < 0:
+            raise ValueError(f"Exponent of {column} must not be negative")
+    for name, value in (('seasonality', seasonality), ('diagnosis_correlation', diagnosis_correlation)):
+        if not value:
+            continue
+        if name not in options:
+            raise ValueError(f"{name} is not supported by this dataset")
+        if not 0 <= value <= 1:
+            raise ValueError(f"{name} must be between 0 and 1")
+        skew[name] = value
+    return skew
+
+
+def plan_chunks(sizes, chunk_rows=CHUNK_ROWS, fixed=()):
+    """(table, chunk_index, start_id, rows) of every chunk, tables in generation order."""
+    chunks = []
+    for table, rows in sizes.items():
+        # Tabele słownikowe generowane w całości - ich wiersze zależą od siebie (np. unikalne kody)
+        table_chunk_rows = rows if table in fixed else chunk_rows
+        for chunk_index, offset in enumerate(range(0, rows, table_chunk_rows)):
+            chunks.append((table, chunk_index, offset + 1, min(table_chunk_rows, rows - offset)))
+    return chunks
+
+
+def chunk_rng(seed, table_index, chunk_index):
+    # Ziarno fragmentu zależy tylko od (seed, tabela, fragment) - nie od kolejności ani liczby procesów
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(table_index, chunk_index)))
+
+
+def shard_path(output, table, chunk_index, file_format):
+    return os.path.join(output, table, f"part-{chunk_index:05d}.{file_format}")
+
+
+def to_documents(df, timestamp_columns=()):
+    """MongoDB form of a chunk: dates as ISO strings, timestamps as extended JSON {'$date': ...}.
+
+    Matches mongo_migrator.py, so generated and migrated collections hold the same values.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df[column]):
+            continue
+        if column in timestamp_columns:
+            df[column] = [{'$date': value} for value in df[column].dt.strftime('%Y-%m-%dT%H:%M:%SZ')]
+        else:
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def write_shard(df, path, file_format, timestamp_columns=()):
+    # Zapis do pliku tymczasowego i rename - przerwany zapis nie zostawia uciętego fragmentu
+    tmp_path = path + ".tmp"
+    if file_format == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    elif file_format == 'jsonl':
+        to_documents(df, timestamp_columns).to_json(tmp_path, orient='records', lines=True, force_ascii=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+# Stan procesu roboczego: moduł generatora, pule Fakera i parametry zbioru
+_worker = {}
+
+
+def _init_worker(module_name, seed, context):
+    generator = importlib.import_module(module_name)
+    _worker.update(generator=generator, pools=generator.build_pools(seed), seed=seed, context=context)
+
+
+def _generate_chunk(task):
+    table, chunk_index, start_id, rows, path, file_format = task
+    generator, context = _worker['generator'], _worker['context']
+    table_index = list(generator.SCALE_FACTOR_ROWS).index(table)
+    rng = chunk_rng(_worker['seed'], table_index, chunk_index)
+    df = generator.generate_chunk(table, start_id, rows, rng, _worker['pools'], context)
+    write_shard(df, path, file_format, getattr(generator, 'TIMESTAMP_COLUMNS', {}).get(table, ()))
+    return table, rows
+
+
+def generate(dataset, scale_factor, output, file_format='csv', seed=None, workers=None, reference_date=None,
+             chunk_rows=CHUNK_ROWS, skew=None):
+    """Generates a dataset into sharded files and writes its manifest; returns the manifest."""
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+
+    module_name = GENERATORS[dataset]
+    generator = load_generator(dataset)
+    if seed is None:
+        # Losowe ziarno zapisywane w manifeście - zbiór da się odtworzyć
+        seed = np.random.SeedSequence().entropy
+    reference_date = reference_date or datetime.date.today()
+    sizes = table_sizes(generator, scale_factor)
+    context = {'sizes': sizes, 'reference_date': reference_date, 'seed': seed, 'skew': skew or {'columns': {}}}
+
+    for table in sizes:
+        os.makedirs(os.path.join(output, table), exist_ok=True)
+    tasks = [
+        (table, chunk_index, start_id, rows, shard_path(output, table, chunk_index, file_format), file_format)
+        for table, chunk_index, start_id, rows in plan_chunks(sizes, chunk_rows,
+                                                              getattr(generator, 'FIXED_TABLES', ()))
+    ]
+
+    start = time.perf_counter()
+    generated = dict.fromkeys(sizes, 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(module_name, seed, context)) as executor:
+        for done, (table, rows) in enumerate(executor.map(_generate_chunk, tasks), start=1):
+            generated[table] += rows
+            print(f"[{done}/{len(tasks)}] {table}: {generated[table]:,} / {sizes[table]:,} rows")
+    elapsed = time.perf_counter() - start
+
+    manifest = {
+        'dataset': dataset,
+        'scale_factor': scale_factor,
+        'seed': seed,
+        'reference_date': reference_date.isoformat(),
+        'format': file_format,
+        'chunk_rows': chunk_rows,
+        'skew': context['skew'],
+        'tables': {
+            table: {
+                'rows': rows,
+                'shards': [os.path.relpath(task[4], output) for task in tasks if task[0] == table],
+            }
+            for table, rows in sizes.items()
+        },
+    }
+    with open(os.path.join(output, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(sizes.values())
+    print(f"Generated {total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s) into {output}")
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel, chunked generation of benchmark datasets.")
+    parser.add_argument('dataset', choices=sorted(GENERATORS))
+    parser.add_argument('--scale-factor', type=float, default=1.0, help="table sizes relative to SF 1")
+    parser.add_argument('--output', help="output directory (default: data/<dataset>-sf<scale factor>)")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--seed', type=int, help="random seed (default: random, recorded in the manifest)")
+    parser.add_argument('--workers', type=int, help="generator processes (default: CPU count)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="rows per chunk and shard file")
+    parser.add_argument('--reference-date', type=datetime.date.fromisoformat,
+                        help="date treated as today, YYYY-MM-DD (default: today)")
+    parser.add_argument('--skew', action='append', default=[], metavar='COLUMN=EXPONENT',
+                        help="Zipf-distributed key or category column, e.g. doctor_id=1.1 or diagnosis=1.2 "
+                             "(repeatable)")
+    parser.add_argument('--seasonality', type=float, default=0.0, help="yearly wave of the dates, 0-1")
+    parser.add_argument('--diagnosis-correlation', type=float, default=0.0,
+                        help="share of diagnoses typical of the doctor's specialization, 0-1 (clinic)")
+    args = parser.parse_args()
+
+    try:
+        skew = parse_skew(load_generator(args.dataset), args.skew, args.seasonality, args.diagnosis_correlation)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or os.path.join("data", f"{args.dataset}-sf{args.scale_factor:g}"
+                                         + ("-jsonl" if args.format == 'jsonl' else ""))
+    generate(args.dataset, args.scale_factor, output, args.format, args.seed, args.workers, args.reference_date,
+             args.chunk_rows, skew)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+# Tryb połączeń PostgreSQL:
+#   'pooled' - pula otwierana raz na cały zestaw zapytań
+#   'cold'   - nowe połączenie dla każdego zapytania (dawne zachowanie)
+PG_CONNECTION_MODE = os.getenv('PG_CONNECTION_MODE', 'pooled')
+PG_POOL_SIZE = int(os.getenv('PG_POOL_SIZE', '4'))
+
+# Tryb klienta MongoDB, analogicznie: 'pooled' (jeden MongoClient na zestaw) lub 'cold'
+MONGO_CONNECTION_MODE = os.getenv('MONGO_CONNECTION_MODE', 'pooled')
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '10'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '1'))
+
+# MongoClient współdzielony w obrębie procesu: jeden na (URI, rozmiar puli), z licznikiem referencji,
+# żeby kolejne zestawy zapytań (np. w run_all_checkout) nie tworzyły klienta od nowa
+_shared_mongo_clients = {}
+_shared_mongo_lock = threading.Lock()
+_retain_shared_clients = False
+
+
+@contextmanager
+def retain_shared_mongo_clients():
+    """Keeps shared MongoClients alive between suites even when no connector holds them."""
+    global _retain_shared_clients
+    _retain_shared_clients = True
+    try:
+        yield
+    finally:
+        _retain_shared_clients = False
+        with _shared_mongo_lock:
+            for key, entry in list(_shared_mongo_clients.items()):
+                if entry['references'] == 0:
+                    entry['client'].close()
+                    del _shared_mongo_clients[key]
+
+
+class _TimedConnectionPool(pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that records how long each new backend connection took to open."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self.connect_times = []
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _connect(self, key=None):
+        start_time = time.perf_counter()
+        conn = super()._connect(key)
+        self.connect_times.append(time.perf_counter() - start_time)
+        return conn
+
+
+class PostgresConnector:
+    """Hands out PostgreSQL connections either from a persistent pool or as fresh cold connections.
+
+    The time spent obtaining each connection is recorded on the sampler as the 'connect'
+    phase, so it is reported separately from query execution time.
+    """
+
+    def __init__(self, config, mode=None, pool_size=None):
+        self.config = config
+        self.mode = mode or PG_CONNECTION_MODE
+        self.pool_size = pool_size or PG_POOL_SIZE
+        if self.mode not in ('pooled', 'cold'):
+            raise ValueError(f"Unknown PG_CONNECTION_MODE: {self.mode}")
+        self.pool = None
+        self.setup_time = 0.0
+        self.first_connection_time = 0.0
+
+    def open(self):
+        """Opens the pool (pooled mode only) with all pool_size connections and returns the setup time."""
+        if self.mode == 'pooled' and self.pool is None:
+            # minconn == maxconn: putconn zamyka połączenia ponad minconn, więc przy mniejszym minconn
+            # pula kurczyłaby się do minconn i kolejne pobrania otwierałyby nowe połączenia w trakcie pomiaru
+            start_time = time.perf_counter()
+            self.pool = _TimedConnectionPool(self.pool_size, self.pool_size, **self.config)
+            self.setup_time = time.perf_counter() - start_time
+            self.first_connection_time = self.pool.connect_times[0]
+        return self.setup_time
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
+
+    @contextmanager
+    def connection(self, sampler=None):
+        start_time = time.perf_counter()
+        if self.mode == 'pooled':
+            self.open()
+            conn = self.pool.getconn()
+        else:
+            conn = psycopg2.connect(**self.config)
+        if sampler is not None:
+            sampler.record_phase('connect', time.perf_counter() - start_time)
+
+        try:
+            yield conn
+        finally:
+            if self.mode == 'pooled':
+                # putconn wycofuje otwartą transakcję, więc połączenie wraca czyste
+                self.pool.putconn(conn)
+            else:
+                conn.close()
+
+    def describe_setup(self):
+        if self.mode == 'pooled':
+            return (
+                f"Client setup: {self.setup_time:.4f} s, first connection: {self.first_connection_time:.4f} s "
+                f"(pool {self.pool_size}-{self.pool_size})\n"
+            )
+        return "Connection mode: cold (new connection per query)\n"
+
+
+class MongoConnector:
+    """Shares one long-lived MongoClient across the suite, or builds a cold client per query.
+
+    Client creation and the first round trip (topology discovery + handshake) are measured
+    once at setup; per query only the time to obtain the database handle is recorded as 'connect'.
+    Pooled connectors with the same URI and pool size share a single client within the process.
+    """
+
+    def __init__(self, uri, database_name, mode=None, max_pool_size=None, min_pool_size=None):
+        self.uri = uri
+        self.database_name = database_name
+        self.mode = mode or MONGO_CONNECTION_MODE
+        self.max_pool_size = max_pool_size or MONGO_MAX_POOL_SIZE
+        self.min_pool_size = min_pool_size if min_pool_size is not None else MONGO_MIN_POOL_SIZE
+        if self.mode not in ('pooled', 'cold'):
+            raise ValueError(f"Unknown MONGO_CONNECTION_MODE: {self.mode}")
+        self.client = None
+        self.setup_time = 0.0
+        self.first_connection_time = 0.0
+
+    def _create_client(self):
+        from pymongo import MongoClient
+
+        return MongoClient(self.uri, maxPoolSize=self.max_pool_size, minPoolSize=self.min_pool_size)
+
+    def _acquire_shared_client(self):
+        key = (self.uri, self.max_pool_size, self.min_pool_size)
+        with _shared_mongo_lock:
+            entry = _shared_mongo_clients.get(key)
+            if entry is not None:
+                # Klient już istnieje i jest rozgrzany - ten zestaw nie płaci za jego utworzenie
+                entry['references'] += 1
+                return entry['client'], 0.0, 0.0
+
+            start_time = time.perf_counter()
+            client = self._create_client()
+            setup_time = time.perf_counter() - start_time
+
+            # MongoClient łączy się leniwie - pierwszy ping to odkrycie topologii i handshake
+            start_time = time.perf_counter()
+            client.admin.command('ping')
+            first_connection_time = time.perf_counter() - start_time
+
+            # Rozgrzewka puli: otwarcie minPoolSize połączeń równolegle
+            if self.min_pool_size > 1:
+                with ThreadPoolExecutor(self.min_pool_size) as executor:
+                    list(executor.map(lambda _: client.admin.command('ping'), range(self.min_pool_size)))
+
+            _shared_mongo_clients[key] = {'client': client, 'references': 1}
+            return client, setup_time, first_connection_time
+
+    def _release_shared_client(self):
+        key = (self.uri, self.max_pool_size, self.min_pool_size)
+        with _shared_mongo_lock:
+            entry = _shared_mongo_clients[key]
+            entry['references'] -= 1
+            if entry['references'] == 0 and not _retain_shared_clients:
+                entry['client'].close()
+                del _shared_mongo_clients[key]
+
+    def open(self):
+        """Acquires the process-wide shared client (created, connected and warmed up on first use)."""
+        if self.mode == 'pooled' and self.client is None:
+            self.client, self.setup_time, self.first_connection_time = self._acquire_shared_client()
+        return self.setup_time
+
+    def close(self):
+        if self.client is not None:
+            self._release_shared_client()
+            self.client = None
+
+    @contextmanager
+    def database(self, sampler=None):
+        start_time = time.perf_counter()
+        if self.mode == 'pooled':
+            self.open()
+            client = self.client
+        else:
+            client = self._create_client()
+            client.admin.command('ping')
+        if sampler is not None:
+            sampler.record_phase('connect', time.perf_counter() - start_time)
+
+        try:
+            yield client[self.database_name]
+        finally:
+            if self.mode == 'cold':
+                client.close()
+
+    def describe_setup(self):
+        if self.mode == 'pooled':
+            return (
+                f"Client setup: {self.setup_time:.4f} s, first connection: {self.first_connection_time:.4f} s "
+                f"(pool {self.min_pool_size}-{self.max_pool_size})\n"
+            )
+        return "Connection mode: cold (new client per query)\n"
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Vectorized generator of the flight dataset (airports, airlines, cancellation_codes, flights).
+
+Follows the layout of the 2015 US flight delays data queried by flight_database_checkout.py
+and flight_MongoDB_checkout.py, with the columns those queries use plus the scheduling and
+distance columns around them. airports, airlines and cancellation_codes are dimension tables of
+fixed size; only flights grows with the scale factor. Run through dataset_generator.py:
+
+    python dataset_generator.py flight --scale-factor 10
+"""
+import datetime
+import itertools
+import string
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from appointments_database.data_generator import sample_dates, sample_keys
+
+AIRPORT_COUNT = 322
+
+# Liczba wierszy tabel przy współczynniku skali 1; tabele słownikowe mają stały rozmiar
+SCALE_FACTOR_ROWS = {'airports': AIRPORT_COUNT, 'airlines': 14, 'cancellation_codes': 4, 'flights': 1_000_000}
+FIXED_TABLES = {'airports', 'airlines', 'cancellation_codes'}
+
+airlines = [
+    ('UA', 'United Air Lines Inc.'), ('AA', 'American Airlines Inc.'), ('US', 'US Airways Inc.'),
+    ('F9', 'Frontier Airlines Inc.'), ('B6', 'JetBlue Airways'), ('OO', 'Skywest Airlines Inc.'),
+    ('AS', 'Alaska Airlines Inc.'), ('NK', 'Spirit Air Lines'), ('WN', 'Southwest Airlines Co.'),
+    ('DL', 'Delta Air Lines Inc.'), ('EV', 'Atlantic Southeast Airlines'), ('HA', 'Hawaiian Airlines Inc.'),
+    ('MQ', 'American Eagle Airlines Inc.'), ('VX', 'Virgin America'),
+]
+
+cancellation_codes = [('A', 'Airline/Carrier'), ('B', 'Weather'), ('C', 'National Air System'), ('D', 'Security')]
+
+# Udział przyczyn odwołań jak w danych z 2015 r.
+CANCELLATION_WEIGHTS = [0.28, 0.54, 0.17, 0.01]
+CANCELLED_RATE = 0.015
+DIVERTED_RATE = 0.0026
+
+# Kolumny, dla których można ustawić rozkład Zipfa (dataset_generator.py --skew), i tabela kluczy
+SKEWABLE_COLUMNS = {'airline': 'airlines', 'origin_airport': 'airports', 'destination_airport': 'airports'}
+SKEW_OPTIONS = {'seasonality'}
+
+# Szczyt sezonu lotów (dzień roku) - połowa lipca
+SEASONAL_PEAK_DAY = 196
+
+airport_suffixes = ['International Airport', 'Regional Airport', 'Municipal Airport', 'County Airport']
+
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS airports (
+    iata_code VARCHAR(3) PRIMARY KEY,
+    airport VARCHAR(100),
+    city VARCHAR(50),
+    state VARCHAR(2),
+    country VARCHAR(50),
+    latitude NUMERIC(8, 5),
+    longitude NUMERIC(8, 5)
+);
+CREATE TABLE IF NOT EXISTS airlines (
+    iata_code VARCHAR(2) PRIMARY KEY,
+    airline VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS cancellation_codes (
+    cancellation_reason CHAR(1) PRIMARY KEY,
+    cancellation_description VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS flights (
+    year SMALLINT,
+    month SMALLINT,
+    day SMALLINT,
+    day_of_week SMALLINT,
+    airline VARCHAR(2) REFERENCES airlines (iata_code),
+    flight_number INTEGER,
+    tail_number VARCHAR(6),
+    origin_airport VARCHAR(3) REFERENCES airports (iata_code),
+    destination_airport VARCHAR(3) REFERENCES airports (iata_code),
+    scheduled_departure SMALLINT,
+    departure_delay INTEGER,
+    distance INTEGER,
+    arrival_delay INTEGER,
+    diverted SMALLINT,
+    cancelled SMALLINT,
+    cancellation_reason CHAR(1) REFERENCES cancellation_codes (cancellation_reason)
+);
+"""
+
+
+def build_pools(seed=None):
+    """Airport codes and Faker cities/states; identical in every worker for the same seed."""
+    fake = Faker('en_US')
+    fake.seed_instance(seed)
+    rng = np.random.default_rng(seed)
+    codes = np.array([''.join(code) for code in itertools.product(string.ascii_uppercase, repeat=3)], dtype=object)
+    letters = np.array(list(string.ascii_uppercase), dtype=object)
+    return {
+        'airport_code': codes[rng.permutation(len(codes))[:AIRPORT_COUNT]],
+        'city': np.array([fake.city() for _ in range(AIRPORT_COUNT)], dtype=object),
+        'state': np.array([fake.state_abbr() for _ in range(AIRPORT_COUNT)], dtype=object),
+        'tail_number': np.array(
+            [f"N{number}{a}{b}" for number, a, b in zip(rng.integers(100, 1000, size=5000),
+                                                        rng.choice(letters, 5000), rng.choice(letters, 5000))],
+            dtype=object,
+        ),
+    }
+
+
+def generate_airports(rng, pools):
+    n = len(pools['airport_code'])
+    countries = np.where(rng.random(n) < 0.9, 'United States', rng.choice(['Canada', 'Mexico'], size=n))
+    return pd.DataFrame({
+        'iata_code': pools['airport_code'],
+        'airport': pools['city'] + ' ' + np.array(airport_suffixes, dtype=object)[rng.integers(0, 4, size=n)],
+        'city': pools['city'],
+        'state': pools['state'],
+        'country': countries,
+        'latitude': rng.uniform(25.0, 49.0, size=n).round(5),
+        'longitude': rng.uniform(-124.0, -67.0, size=n).round(5),
+    })
+
+
+def generate_flights(n, rng, pools, context):
+    year = context['reference_date'].year
+    dates = pd.DatetimeIndex(sample_dates(rng, n, datetime.date(year, 1, 1), datetime.date(year, 12, 31), context,
+                                          SEASONAL_PEAK_DAY))
+    airport_codes = pools['airport_code']
+    origin = sample_keys(rng, n, len(airport_codes), 'origin_airport', context) - 1
+    if 'destination_airport' in context.get('skew', {}).get('columns', {}):
+        destination = sample_keys(rng, n, len(airport_codes), 'destination_airport', context) - 1
+        # Lotnisko docelowe różne od wylotowego - kolizje przesunięte na sąsiedni kod
+        destination = np.where(destination == origin, (destination + 1) % len(airport_codes), destination)
+    else:
+        # Lotnisko docelowe różne od wylotowego
+        destination = (origin + rng.integers(1, len(airport_codes), size=n)) % len(airport_codes)
+    airline = sample_keys(rng, n, len(airlines), 'airline', context) - 1
+
+    cancelled = rng.random(n) < CANCELLED_RATE
+    diverted = ~cancelled & (rng.random(n) < DIVERTED_RATE)
+    # Opóźnienia prawoskośne: większość lotów o czasie lub wcześniej, długi ogon opóźnień
+    departure_delay = np.rint(rng.exponential(20.0, size=n) - 10.0)
+    arrival_delay = np.rint(departure_delay + rng.normal(-5.0, 10.0, size=n))
+    codes = np.array([code for code, _ in cancellation_codes], dtype=object)
+    reasons = codes[rng.choice(len(codes), size=n, p=CANCELLATION_WEIGHTS)]
+
+    return pd.DataFrame({
+        'year': year,
+        'month': dates.month,
+        'day': dates.day,
+        'day_of_week': dates.dayofweek + 1,
+        'airline': np.array([code for code, _ in airlines], dtype=object)[airline],
+        'flight_number': rng.integers(1, 7000, size=n),
+        'tail_number': pools['tail_number'][rng.integers(0, len(pools['tail_number']), size=n)],
+        'origin_airport': airport_codes[origin],
+        'destination_airport': airport_codes[destination],
+        'scheduled_departure': rng.integers(5, 24, size=n) * 100 + rng.integers(0, 12, size=n) * 5,
+        'departure_delay': pd.array(np.where(cancelled, np.nan, departure_delay), dtype='Int64'),
+        'distance': rng.integers(100, 3000, size=n),
+        'arrival_delay': pd.array(np.where(cancelled | diverted, np.nan, arrival_delay), dtype='Int64'),
+        'diverted': diverted.astype(int),
+        'cancelled': cancelled.astype(int),
+        'cancellation_reason': np.where(cancelled, reasons, None),
+    })
+
+
+def generate_chunk(table, start_id, n, rng, pools, context):
+    """Rows of one chunk; the dimension tables are generated whole in their single chunk."""
+    if table == 'airports':
+        return generate_airports(rng, pools)
+    if table == 'airlines':
+        return pd.DataFrame(airlines, columns=['iata_code', 'airline'])
+    if table == 'cancellation_codes':
+        return pd.DataFrame(cancellation_codes, columns=['cancellation_reason', 'cancellation_description'])
+    if table == 'flights':
+        return generate_flights(n, rng, pools, context)
+    raise ValueError(f"Unknown table: {table}")
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Concurrent load generator for the checkout workloads.
+
+Drives the `queries` lists of the six checkout scripts from N worker threads or processes:
+    closed loop - every client issues its next query as soon as the previous one finishes
+    open loop   - queries are issued on a fixed schedule (target QPS); latency is measured
+                  from the scheduled start, so queueing delay is not hidden
+
+Example:
+    python load_test.py --workload clinic --engine postgresql --clients 1 4 16 --duration 30
+    python load_test.py --workload flight --engine mongodb --mode open --qps 200 --clients 8
+"""
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+
+from benchmark_registry import DATASETS, ENGINES, get_workload, load_module
+from db_connections import MongoConnector, PostgresConnector
+from query_statistics import percentile
+
+LOAD_RESULTS_FILE = "load_results.jsonl"
+
+# Górne granice kubełków histogramu opóźnień (ms); ostatni kubełek jest otwarty
+HISTOGRAM_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# Jak długo klienci czekają na siebie przed startem (uruchomienie procesów i połączenie z bazą)
+START_BARRIER_TIMEOUT = 120
+
+
+def load_workload(workload, engine):
+    return load_module(get_workload(workload, engine))
+
+
+def query_label(query):
+    return query['name'] if isinstance(query, dict) else query
+
+
+def configure_connector(module, engine, pool_size):
+    """Replaces the module's connector with one sized for pool_size concurrent clients."""
+    module.connector.close()
+    if engine == 'postgresql':
+        module.connector = PostgresConnector(module.DATABASE_CONFIG, pool_size=pool_size)
+    else:
+        module.connector = MongoConnector(module.MONGODB_URI, module.DATABASE_NAME,
+                                          max_pool_size=pool_size, min_pool_size=pool_size)
+    module.connector.open()
+
+
+def run_client(workload, engine, query_indexes, mode, duration, rate, client_id, clients, own_connector=False,
+               start_barrier=None):
+    """One load client; returns ([(query_index, latency_s, error_message_or_None)], first send, last finish).
+
+    The window timestamps are wall-clock (time.time()), comparable across worker processes. With a
+    start_barrier every client starts sending once all of them are ready.
+    """
+    module = load_workload(workload, engine)
+    if own_connector:
+        # Procesy robocze mają własną pulę (jedno połączenie na klienta)
+        configure_connector(module, engine, 1)
+    if start_barrier is not None:
+        start_barrier.wait(START_BARRIER_TIMEOUT)
+
+    results = []
+    window_start = time.time()
+    start_time = time.perf_counter()
+    deadline = start_time + duration
+    interval = 1 / rate if rate else 0.0
+    # Rozłożenie startu klientów w otwartej pętli, żeby nie wysyłały zapytań jednocześnie
+    next_start = start_time + interval * client_id / clients
+    position = client_id
+
+    try:
+        while True:
+            if mode == 'open':
+                now = time.perf_counter()
+                if next_start > now:
+                    time.sleep(next_start - now)
+                scheduled = next_start
+                next_start += interval
+            else:
+                scheduled = time.perf_counter()
+            if scheduled >= deadline:
+                break
+
+            index = query_indexes[position % len(query_indexes)]
+            position += 1
+            error = None
+            try:
+                module.run_query(module.queries[index])
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.append((index, time.perf_counter() - scheduled, error))
+        window_end = time.time()
+    finally:
+        if own_connector:
+            module.connector.close()
+    return results, window_start, window_end
+
+
+def histogram(latencies):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for latency in latencies:
+        ms = latency * 1000
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if ms <= bound), len(HISTOGRAM_BUCKETS_MS))
+        counts[bucket] += 1
+    labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+
+def summarize_results(results, elapsed):
+    latencies = [latency for _, latency, error in results if error is None]
+    errors = [error for _, _, error in results if error is not None]
+    summary = {
+        'requests': len(results),
+        'errors': len(errors),
+        'error_rate': len(errors) / len(results) if results else 0.0,
+        'throughput_qps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'first_error': errors[0] if errors else None,
+    }
+    if latencies:
+        summary.update({
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': max(latencies) * 1000,
+            'histogram': histogram(latencies),
+        })
+    return summary
+
+
+def run_load(workload, engine, clients, mode='closed', duration=30.0, qps=None, query_index=None,
+             use_processes=False):
+    """Runs one load level and returns per-query and total summary records."""
+    module = load_workload(workload, engine)
+    query_indexes = [query_index] if query_index is not None else list(range(len(module.queries)))
+    rate = qps / clients if mode == 'open' else None
+
+    with ExitStack() as stack:
+        if use_processes:
+            # Bariera przez menedżera - obiekty synchronizacji nie przechodzą do puli procesów inaczej
+            start_barrier = stack.enter_context(multiprocessing.Manager()).Barrier(clients)
+            executor = ProcessPoolExecutor(clients)
+        else:
+            # Wątki współdzielą pulę połączeń modułu, więc musi ona pomieścić wszystkich klientów
+            configure_connector(module, engine, clients)
+            stack.callback(module.connector.close)
+            start_barrier = threading.Barrier(clients)
+            executor = ThreadPoolExecutor(clients)
+
+        with executor:
+            futures = [
+                executor.submit(run_client, workload, engine, query_indexes, mode, duration, rate, client_id,
+                                clients, use_processes, start_barrier)
+                for client_id in range(clients)
+            ]
+            outcomes = [future.result() for future in futures]
+
+    # Czas od wspólnego startu do ostatniego zakończenia - bez uruchamiania procesów i importów
+    results = [record for client_results, _, _ in outcomes for record in client_results]
+    elapsed = max(end for _, _, end in outcomes) - min(start for _, start, _ in outcomes)
+
+    base = {
+        'workload': workload,
+        'engine': engine,
+        'mode': mode,
+        'clients': clients,
+        'target_qps': qps,
+        'workers': 'process' if use_processes else 'thread',
+        'duration_s': elapsed,
+    }
+    records = []
+    for index in query_indexes:
+        per_query = [r for r in results if r[0] == index]
+        records.append({**base, 'query': query_label(module.queries[index]),
+                        **summarize_results(per_query, elapsed)})
+    records.append({**base, 'query': 'TOTAL', **summarize_results(results, elapsed)})
+    return records
+
+
+def print_records(records):
+    for record in records:
+        latency = (
+            f"p50 {record['p50_ms']:.2f} ms, p95 {record['p95_ms']:.2f} ms, p99 {record['p99_ms']:.2f} ms"
+            if 'p50_ms' in record else "no successful requests"
+        )
+        print(
+            f"[{record['engine']} {record['workload']} {record['mode']} x{record['clients']}] "
+            f"{str(record['query'])[:60]}: {record['throughput_qps']:.1f} q/s, "
+            f"errors {record['error_rate']:.2%}, {latency}"
+            + (f", pool {record['pool_size']}: acquire wait p95 {record['acquire_wait_p95_ms']:.2f} ms"
+               if 'acquire_wait_p95_ms' in record else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the checkout workloads.")
+    parser.add_argument('--workload', choices=DATASETS, required=True)
+    parser.add_argument('--engine', choices=ENGINES, required=True)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                        help="client counts to run, one load level each")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--qps', type=float, help="target total QPS (open loop)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per load level")
+    parser.add_argument('--query', type=int, help="run only this query (index in the queries list)")
+    parser.add_argument('--processes', action='store_true', help="use worker processes instead of threads")
+    parser.add_argument('--output', default=LOAD_RESULTS_FILE, help="JSON Lines file to append the records to")
+    args = parser.parse_args()
+
+    if args.mode == 'open' and not args.qps:
+        parser.error("--qps is required in open-loop mode")
+
+    for clients in args.clients:
+        print(f"Running {args.mode}-loop load with {clients} clients for {args.duration:.0f} s...")
+        records = run_load(args.workload, args.engine, clients, args.mode, args.duration, args.qps,
+                           args.query, args.processes)
+        print_records(records)
+        with open(args.output, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
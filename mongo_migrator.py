@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""Parallel migration of the PostgreSQL benchmark databases into MongoDB.
+
+Copies every table of a dataset's PostgreSQL database (przychodnia, loty, trip) into the
+collection of the same name in the database its MongoDB checkout script queries, so both
+engines run on identical data. Each table is split into key ranges: by its integer primary
+key when it has one, otherwise by ctid page ranges. Worker processes stream their range
+through a server-side cursor and write the documents with unordered insert_many. Indexes
+matching the PostgreSQL ones are built after the bulk load, then row counts are verified.
+
+Documents keep the column names; NUMERIC becomes float and DATE/TIME an ISO string (the
+MongoDB queries compare dates as strings, e.g. {'birthdate': {'$lt': '2000-01-01'}}). NULLs in
+columns of a unique index are left out of the document, so the partial unique index built
+for them allows many missing values like PostgreSQL does; {column: None} still matches them.
+
+Example:
+    python mongo_migrator.py --datasets clinic trip --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from benchmark_registry import DATASETS, get_workload, load_module
+
+# Docelowa liczba wierszy jednego zakresu (zadania procesu roboczego)
+MIGRATE_CHUNK_ROWS = int(os.getenv('MIGRATE_CHUNK_ROWS', '200000'))
+
+# Wiersze pobierane z kursora serwerowego i wysyłane jednym insert_many
+MIGRATE_BATCH_SIZE = int(os.getenv('MIGRATE_BATCH_SIZE', '10000'))
+
+# Tabele pomocnicze ładowania, nieobecne w zapytaniach MongoDB
+EXCLUDED_TABLES = {'load_checkpoints'}
+
+
+def endpoints(dataset):
+    """(PostgreSQL config, MongoDB URI, MongoDB database name) of a dataset's checkout scripts."""
+    postgres = load_module(get_workload(dataset, 'postgresql'))
+    mongo = load_module(get_workload(dataset, 'mongodb'))
+    return postgres.DATABASE_CONFIG, mongo.MONGODB_URI, mongo.DATABASE_NAME
+
+
+def list_tables(conn, tables=None):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relkind = 'r' AND n.nspname = 'public' ORDER BY c.relname"
+        )
+        names = [row[0] for row in cursor.fetchall() if row[0] not in EXCLUDED_TABLES]
+    return [name for name in names if not tables or name in tables]
+
+
+def _converted_columns(conn, table):
+    """Columns whose values need a BSON-friendly conversion: {column: converter name}."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s",
+            (table,),
+        )
+        types = cursor.fetchall()
+    converted = {}
+    for column, data_type in types:
+        if data_type == 'numeric':
+            converted[column] = 'float'
+        elif data_type == 'date' or data_type.startswith('time '):
+            converted[column] = 'isoformat'
+    return converted
+
+
+def _integer_key(conn, table):
+    """The single-column integer primary key of a table, or None."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary AND i.indnatts = 1",
+            (table,),
+        )
+        row = cursor.fetchone()
+    if row and row[1] in ('integer', 'bigint', 'smallint'):
+        return row[0]
+    return None
+
+
+def plan_ranges(conn, table, chunk_rows=MIGRATE_CHUNK_ROWS):
+    """WHERE clauses splitting a table into ranges of roughly chunk_rows rows."""
+    key = _integer_key(conn, table)
+    with conn.cursor() as cursor:
+        if key is not None:
+            # Granice z rozkładu klucza (percentile_disc), a nie z MIN..MAX - rzadkie klucze
+            # dawałyby tysiące pustych zakresów
+            cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+            tuples = cursor.fetchone()[0]
+            if not tuples:
+                # reltuples = -1/0 (tabela bez ANALYZE) - dokładna liczba
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                tuples = cursor.fetchone()[0]
+            if not tuples:
+                return []
+            chunks = -(-tuples // chunk_rows)
+            if chunks < 2:
+                return ["TRUE"]
+            cursor.execute(
+                f"SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY {key}) FROM {table}",
+                ([i / chunks for i in range(1, chunks)],),
+            )
+            bounds = sorted(set(bound for bound in cursor.fetchone()[0] or [] if bound is not None))
+            if not bounds:
+                return ["TRUE"]
+            # Skrajne zakresy bez granic - wiersze spoza rozkładu z chwili planowania
+            return (
+                [f"{key} < {bounds[0]}"]
+                + [f"{key} >= {low} AND {key} < {high}" for low, high in zip(bounds, bounds[1:])]
+                + [f"{key} >= {bounds[-1]}"]
+            )
+        # Bez klucza całkowitego: zakresy stron (ctid) - od PostgreSQL 14 skan TID Range
+        cursor.execute(
+            "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int, reltuples "
+            "FROM pg_class WHERE oid = %s::regclass",
+            (table, table),
+        )
+        pages, tuples = cursor.fetchone()
+    # reltuples = -1 (tabela bez ANALYZE) - wtedy zakresy po chunk_rows stron
+    rows_per_page = max(tuples, 1) / max(pages, 1)
+    pages_per_chunk = max(1, int(chunk_rows / max(rows_per_page, 1)))
+    # Ostatni zakres bez górnej granicy - strony dopisane po pomiarze rozmiaru
+    bounds = list(range(0, max(pages, 1), pages_per_chunk))
+    return [
+        f"ctid >= '({start},0)'::tid" + (f" AND ctid < '({bounds[i + 1]},0)'::tid" if i + 1 < len(bounds) else "")
+        for i, start in enumerate(bounds)
+    ]
+
+
+def _convert(value, converter):
+    if value is None:
+        return None
+    if converter == 'float':
+        return float(value)
+    return value.isoformat()
+
+
+def _insert(collection, documents):
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        # Przy ordered=False pozostałe dokumenty są zapisane; zgłaszamy tylko liczbę błędów
+        print(f"{collection.name}: {len(e.details['writeErrors'])} documents rejected")
+
+
+def _migrate_range(task):
+    dataset, table, where, converted, omitted = task
+    config, uri, database_name = endpoints(dataset)
+    conn = psycopg2.connect(**config)
+    client = MongoClient(uri)
+    collection = client[database_name][table]
+    rows = 0
+    start = time.perf_counter()
+    try:
+        # Nazwany kursor = kursor serwerowy; wiersze przychodzą porcjami po MIGRATE_BATCH_SIZE
+        with conn.cursor(name=f"migrate_{table}") as cursor:
+            cursor.itersize = MIGRATE_BATCH_SIZE
+            cursor.execute(f"SELECT * FROM {table} WHERE {where}")
+            columns = None
+            while True:
+                batch = cursor.fetchmany(MIGRATE_BATCH_SIZE)
+                if not batch:
+                    break
+                if columns is None:
+                    columns = [column[0] for column in cursor.description]
+                    conversions = [(i, converted[c]) for i, c in enumerate(columns) if c in converted]
+                documents = []
+                for row in batch:
+                    document = dict(zip(columns, row))
+                    for i, converter in conversions:
+                        document[columns[i]] = _convert(row[i], converter)
+                    for column in omitted:
+                        if document[column] is None:
+                            del document[column]
+                    documents.append(document)
+                _insert(collection, documents)
+                rows += len(documents)
+    finally:
+        conn.close()
+        client.close()
+    return dataset, table, rows, time.perf_counter() - start
+
+
+def postgres_indexes(conn, table):
+    """(name, [columns], unique, [nullable columns]) of the plain column indexes of a table, primary key included."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, i.indisunique, i.indisprimary, "
+            "ARRAY(SELECT a.attname FROM unnest(i.indkey) WITH ORDINALITY k(attnum, n) "
+            "      JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum ORDER BY k.n), "
+            "ARRAY(SELECT a.attname FROM unnest(i.indkey) k(attnum) "
+            "      JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum WHERE NOT a.attnotnull) "
+            "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND i.indexprs IS NULL AND i.indpred IS NULL",
+            (table,),
+        )
+        return [
+            (name, list(columns), unique, list(nullable))
+            for name, unique, primary, columns, nullable in cursor.fetchall()
+        ]
+
+
+def unique_nullable_columns(indexes):
+    """Nullable columns of unique indexes - migrated without the field when NULL, see create_indexes."""
+    return sorted({column for _, _, unique, nullable in indexes if unique for column in nullable})
+
+
+def create_indexes(collection, indexes):
+    """Builds the indexes; returns the names of those MongoDB rejected (reported, not raised)."""
+    failed = []
+    for name, columns, unique, nullable in indexes:
+        options = {}
+        if unique and nullable:
+            # PostgreSQL dopuszcza wiele NULL w indeksie unikalnym, MongoDB traktuje null jak wartość:
+            # puste pola są pomijane w dokumentach, a indeks obejmuje tylko dokumenty z tymi polami
+            options['partialFilterExpression'] = {column: {'$exists': True} for column in nullable}
+        start = time.perf_counter()
+        try:
+            collection.create_index([(column, ASCENDING) for column in columns], name=name, unique=unique, **options)
+        except OperationFailure as e:
+            print(f"  {collection.name}.{name}: FAILED - {e}")
+            failed.append(name)
+            continue
+        print(f"  {collection.name}.{name} ({', '.join(columns)}{', unique' if unique else ''}): "
+              f"{time.perf_counter() - start:.2f} s")
+    return failed
+
+
+def migrate(datasets=None, tables=None, workers=None, chunk_rows=MIGRATE_CHUNK_ROWS):
+    """Migrates the datasets; returns [(dataset, table, postgres rows, mongo documents)]."""
+    tasks = []
+    plans = {}
+    for dataset in datasets or DATASETS:
+        config, uri, database_name = endpoints(dataset)
+        conn = psycopg2.connect(**config)
+        client = MongoClient(uri)
+        try:
+            for table in list_tables(conn, tables):
+                converted = _converted_columns(conn, table)
+                ranges = plan_ranges(conn, table, chunk_rows)
+                plans[(dataset, table)] = postgres_indexes(conn, table)
+                omitted = unique_nullable_columns(plans[(dataset, table)])
+                # Migracja zastępuje kolekcję - oba silniki na identycznych danych
+                client[database_name].drop_collection(table)
+                tasks.extend((dataset, table, where, converted, omitted) for where in ranges)
+                print(f"{dataset}.{table}: {len(ranges)} ranges")
+        finally:
+            conn.close()
+            client.close()
+
+    start = time.perf_counter()
+    totals = {key: [0, 0.0] for key in plans}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for dataset, table, rows, elapsed in executor.map(_migrate_range, tasks):
+            totals[(dataset, table)][0] += rows
+            totals[(dataset, table)][1] += elapsed
+    elapsed = time.perf_counter() - start
+    total_rows = sum(rows for rows, _ in totals.values())
+    for (dataset, table), (rows, busy) in totals.items():
+        print(f"{dataset}.{table}: {rows:,} documents, {rows / busy if busy else 0:,.0f} docs/s per worker")
+    print(f"Migrated {total_rows:,} documents in {elapsed:.1f} s ({total_rows / elapsed if elapsed else 0:,.0f} docs/s)")
+
+    print("Creating indexes:")
+    verification = []
+    failed_indexes = []
+    for dataset, table in plans:
+        config, uri, database_name = endpoints(dataset)
+        conn = psycopg2.connect(**config)
+        client = MongoClient(uri)
+        try:
+            collection = client[database_name][table]
+            # Odrzucony indeks nie przerywa migracji - weryfikacja liczby wierszy i tak się odbywa
+            failed = create_indexes(collection, plans[(dataset, table)])
+            failed_indexes.extend(f"{dataset}.{table}.{name}" for name in failed)
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                postgres_rows = cursor.fetchone()[0]
+            verification.append((dataset, table, postgres_rows, collection.count_documents({})))
+        finally:
+            conn.close()
+            client.close()
+
+    for dataset, table, postgres_rows, documents in verification:
+        status = "OK" if postgres_rows == documents else "MISMATCH"
+        print(f"[{status}] {dataset}.{table}: PostgreSQL {postgres_rows:,} rows, MongoDB {documents:,} documents")
+    if failed_indexes:
+        print(f"Indexes not created: {', '.join(failed_indexes)}")
+    return verification
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel PostgreSQL-to-MongoDB migration of the benchmark datasets.")
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, help="datasets to migrate (default: all)")
+    parser.add_argument('--tables', nargs='+', help="only these tables")
+    parser.add_argument('--workers', type=int, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--chunk-rows', type=int, default=MIGRATE_CHUNK_ROWS, help="rows per key range")
+    args = parser.parse_args()
+
+    verification = migrate(args.datasets, args.tables, args.workers, args.chunk_rows)
+    if any(postgres_rows != documents for _, _, postgres_rows, documents in verification):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
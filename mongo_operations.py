@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Zapytania MongoDB typu 'operation' to synchroniczne lambdy, np.
+#   lambda collection: list(collection.find({...}, {...}).limit(10))
+# Poniższe klasy pozwalają odczytać, jakie wywołania budują, bez łączenia z bazą -
+# na potrzeby sterownika async (replay), komendy explain oraz trybu strumieniowego.
+
+
+class RecordedCursor:
+    """Records chained cursor calls (limit, sort, ...) so they can be replayed on an async cursor."""
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return call
+
+    def __iter__(self):
+        # list(cursor) w operacji synchronicznej - właściwe pobranie robi replay()
+        return iter(())
+
+
+class RecordingCollection:
+    """Stand-in collection passed to the synchronous 'operation' lambdas to capture the find() they build."""
+
+    def __init__(self):
+        self.cursor = None
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            self.cursor = RecordedCursor(method, args, kwargs)
+            return self.cursor
+        return call
+
+
+def record_operation(operation):
+    """Runs an 'operation' lambda against a RecordingCollection and returns the RecordedCursor it built."""
+    recorder = RecordingCollection()
+    operation(recorder)
+    return recorder.cursor
+
+
+def build_cursor(collection, recorded, skip_calls=()):
+    """Rebuilds a recorded find() chain on a real (sync or async) collection, leaving out skip_calls."""
+    cursor = getattr(collection, recorded.method)(*recorded.args, **recorded.kwargs)
+    for name, args, kwargs in recorded.calls:
+        if name not in skip_calls:
+            cursor = getattr(cursor, name)(*args, **kwargs)
+    return cursor
+
+
+def find_command(collection_name, recorded):
+    """Builds the 'find' command document equivalent to a recorded find().limit()/sort()/skip() chain."""
+    if recorded.method != 'find':
+        raise ValueError(f"Only find() operations can be converted to a command, got {recorded.method}()")
+
+    args = list(recorded.args)
+    command = {'find': collection_name, 'filter': recorded.kwargs.get('filter', args[0] if args else {})}
+    projection = recorded.kwargs.get('projection', args[1] if len(args) > 1 else None)
+    if projection is not None:
+        command['projection'] = projection
+    for name, call_args, _ in recorded.calls:
+        if name in ('limit', 'skip'):
+            command[name] = call_args[0]
+        elif name == 'sort':
+            key = call_args[0]
+            command['sort'] = dict(key) if isinstance(key, list) else {key: call_args[1] if len(call_args) > 1 else 1}
+    return command
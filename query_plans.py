@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from mongo_operations import find_command, record_operation
+
+# Zapisywanie planów wykonania (EXPLAIN ANALYZE / explain executionStats) obok czasów klienta
+CAPTURE_PLANS = os.getenv('CAPTURE_PLANS', '0') == '1'
+
+
+def _walk(node, children_key):
+    yield node
+    for child in node.get(children_key, []):
+        yield from _walk(child, children_key)
+
+
+def explain_postgres(conn, query):
+    """Runs the query under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and summarizes the plan."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+        result = cursor.fetchone()[0]
+    # EXPLAIN ANALYZE wykonuje zapytanie - wycofujemy, żeby połączenie wróciło czyste do puli
+    conn.rollback()
+
+    if isinstance(result, str):
+        result = json.loads(result)
+    plan = result[0]
+    root = plan['Plan']
+
+    rows_examined = 0
+    indexes = []
+    for node in _walk(root, 'Plans'):
+        if 'Scan' in node['Node Type']:
+            loops = node.get('Actual Loops', 1)
+            rows_examined += (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+        if 'Index Name' in node and node['Index Name'] not in indexes:
+            indexes.append(node['Index Name'])
+
+    return {
+        'planning_ms': plan.get('Planning Time'),
+        'execution_ms': plan.get('Execution Time'),
+        'rows_examined': rows_examined,
+        'rows_returned': root.get('Actual Rows', 0) * root.get('Actual Loops', 1),
+        'buffer_hits': root.get('Shared Hit Blocks'),
+        'buffer_reads': root.get('Shared Read Blocks'),
+        'indexes': indexes,
+        'lookups': [],
+        'raw': result,
+    }
+
+
+def _walk_mongo(stage):
+    """Yields a Mongo plan stage and all of its input stages."""
+    yield stage
+    for child in ('inputStage', 'outerStage', 'innerStage'):
+        if child in stage:
+            yield from _walk_mongo(stage[child])
+    for child in stage.get('inputStages', []):
+        yield from _walk_mongo(child)
+
+
+def _mongo_indexes(plan):
+    return list(dict.fromkeys(stage['indexName'] for stage in _walk_mongo(plan) if 'indexName' in stage))
+
+
+def _summarize_execution_stats(explain):
+    stats = explain.get('executionStats', {})
+    winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+    # Silnik SBE zagnieżdża plan w 'queryPlan'
+    winning_plan = winning_plan.get('queryPlan', winning_plan)
+    return {
+        'execution_ms': stats.get('executionTimeMillis'),
+        'rows_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'rows_returned': stats.get('nReturned'),
+        'indexes': _mongo_indexes(winning_plan),
+        'stages': stats.get('executionStages', {}),
+    }
+
+
+def _lookup_stages(explain):
+    lookups = []
+    # Klasyczny silnik: każdy etap pipeline osobno, $lookup ze swoimi statystykami
+    for stage in explain.get('stages', []):
+        if '$lookup' in stage:
+            lookups.append({
+                'from': stage['$lookup'].get('from'),
+                'time_ms': stage.get('executionTimeMillisEstimate'),
+                'docs_examined': stage.get('totalDocsExamined'),
+                'keys_examined': stage.get('totalKeysExamined'),
+                'collection_scans': stage.get('collectionScans'),
+                'indexes_used': stage.get('indexesUsed'),
+            })
+    # SBE: $lookup wypchnięty do planu zapytania jako etap EQ_LOOKUP
+    stages = explain.get('executionStats', {}).get('executionStages')
+    if stages:
+        for stage in _walk_mongo(stages):
+            if stage.get('stage') == 'EQ_LOOKUP':
+                lookups.append({
+                    'from': stage.get('foreignCollection'),
+                    'time_ms': stage.get('executionTimeMillisEstimate'),
+                    'docs_examined': stage.get('totalDocsExamined'),
+                    'keys_examined': stage.get('totalKeysExamined'),
+                    'collection_scans': stage.get('collectionScans'),
+                    'indexes_used': stage.get('indexesUsed'),
+                })
+    return lookups
+
+
+def explain_mongo(db, query):
+    """Runs explain with 'executionStats' verbosity for a find operation or an aggregation pipeline."""
+    collection_name = query['collection']
+    if 'pipeline' in query:
+        command = {'aggregate': collection_name, 'pipeline': query['pipeline'], 'cursor': {}}
+    else:
+        command = find_command(collection_name, record_operation(query['operation']))
+    explain = db.command('explain', command, verbosity='executionStats')
+
+    if 'stages' in explain:
+        # Statystyki dostępu do kolekcji są w pierwszym etapie ($cursor)
+        cursor_stage = explain['stages'][0].get('$cursor', {})
+        summary = _summarize_execution_stats(cursor_stage)
+    else:
+        summary = _summarize_execution_stats(explain)
+
+    summary.pop('stages')
+    summary.update({
+        'planning_ms': None,
+        'buffer_hits': None,
+        'buffer_reads': None,
+        'lookups': _lookup_stages(explain),
+        'raw': explain,
+    })
+    return summary
+
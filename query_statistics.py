@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import math
+import os
+import random
+import statistics
+
+# Liczba losowań bootstrap dla przedziału ufności
+BOOTSTRAP_RESAMPLES = int(os.getenv('BOOTSTRAP_RESAMPLES', '2000'))
+
+
+def percentile(values, q):
+    """Percentile with linear interpolation between closest ranks (same as numpy's default)."""
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile() of empty data")
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def bootstrap_ci(values, statistic=statistics.median, confidence=0.95, resamples=None, seed=0):
+    """Percentile bootstrap confidence interval for statistic(values)."""
+    resamples = resamples or BOOTSTRAP_RESAMPLES
+    if len(values) < 2:
+        return values[0], values[0]
+
+    rng = random.Random(seed)
+    estimates = [statistic(rng.choices(values, k=len(values))) for _ in range(resamples)]
+    alpha = (1 - confidence) / 2 * 100
+    return percentile(estimates, alpha), percentile(estimates, 100 - alpha)
+
+
+def summarize(values, confidence=0.95):
+    """min, median, mean, p95, p99, standard deviation and a bootstrap CI of the median."""
+    ci_low, ci_high = bootstrap_ci(values, confidence=confidence)
+    return {
+        'count': len(values),
+        'min': min(values),
+        'median': statistics.median(values),
+        'mean': statistics.fmean(values),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'std': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+    }
+
+
+def bootstrap_ratio_ci(baseline, current, statistic=statistics.median, confidence=0.95, resamples=None, seed=0):
+    """Bootstrap CI of statistic(current) / statistic(baseline), resampling both samples independently."""
+    resamples = resamples or BOOTSTRAP_RESAMPLES
+    rng = random.Random(seed)
+    estimates = [
+        statistic(rng.choices(current, k=len(current))) / statistic(rng.choices(baseline, k=len(baseline)))
+        for _ in range(resamples)
+    ]
+    alpha = (1 - confidence) / 2 * 100
+    return percentile(estimates, alpha), percentile(estimates, 100 - alpha)
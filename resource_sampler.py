@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+# Domyślny odstęp między próbkami (ms), można nadpisać w pliku .env
+DEFAULT_INTERVAL_MS = float(os.getenv('SAMPLER_INTERVAL_MS', '5'))
+
+# Pomiar procesów serwera (backend postgres / mongod) zamiast samego klienta
+SERVER_METRICS = os.getenv('SERVER_METRICS', '0') == '1'
+
+MB = 1024 * 1024
+
+Snapshot = namedtuple(
+    'Snapshot',
+    ['timestamp', 'system_busy', 'system_total', 'process_cpu', 'rss',
+     'read_bytes', 'write_bytes', 'ctx_switches']
+)
+
+
+def _system_cpu_times():
+    """Returns (busy, total) CPU seconds for the whole machine."""
+    times = psutil.cpu_times()
+    total = sum(times)
+    idle = times.idle + getattr(times, 'iowait', 0.0)
+    return total - idle, total
+
+
+def _io_counters(process):
+    """Returns (read_bytes, write_bytes) or (None, None) if the platform does not expose them."""
+    try:
+        io = process.io_counters()
+    except (AttributeError, psutil.AccessDenied, NotImplementedError):
+        return None, None
+    return io.read_bytes, io.write_bytes
+
+
+ServerSnapshot = namedtuple(
+    'ServerSnapshot',
+    ['timestamp', 'cpu_time', 'rss', 'read_bytes', 'write_bytes', 'page_faults']
+)
+
+
+def _page_faults(process):
+    """Returns the cumulative (minor + major) page fault count, or None if unavailable."""
+    try:
+        with open(f'/proc/{process.pid}/stat') as f:
+            # Pole comm może zawierać spacje, więc dzielimy po ostatnim nawiasie
+            fields = f.read().rsplit(')', 1)[1].split()
+        return int(fields[7]) + int(fields[9])  # minflt, majflt
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        info = process.memory_info()
+    except psutil.Error:
+        return None
+    # Windows: num_page_faults, macOS: pfaults
+    return getattr(info, 'num_page_faults', getattr(info, 'pfaults', None))
+
+
+def _is_local_process(pid, name):
+    try:
+        return name in psutil.Process(pid).name().lower()
+    except psutil.Error:
+        return False
+
+
+def find_postgres_backend(conn):
+    """Returns the psutil.Process of the postgres backend serving conn, or None if the server is not local."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid();")
+        pid = cursor.fetchone()[0]
+    return psutil.Process(pid) if _is_local_process(pid, 'postgres') else None
+
+
+_mongod_process = None
+
+
+def find_mongod_process(db):
+    """Returns the psutil.Process of the local mongod serving db (cached), or None if not found."""
+    global _mongod_process
+    if _mongod_process is not None and _mongod_process.is_running():
+        return _mongod_process
+
+    pid = db.client.admin.command('serverStatus').get('pid')
+    if pid is not None and _is_local_process(pid, 'mongod'):
+        _mongod_process = psutil.Process(pid)
+    else:
+        # Serwer może raportować pid z kontenera, szukamy więc po nazwie
+        _mongod_process = next(
+            (p for p in psutil.process_iter(['name']) if (p.info['name'] or '').lower().startswith('mongod')),
+            None
+        )
+    return _mongod_process
+
+
+def _server_snapshot(process):
+    cpu_times = process.cpu_times()
+    read_bytes, write_bytes = _io_counters(process)
+    return ServerSnapshot(
+        timestamp=time.perf_counter(),
+        cpu_time=cpu_times.user + cpu_times.system,
+        rss=process.memory_info().rss,
+        read_bytes=read_bytes,
+        write_bytes=write_bytes,
+        page_faults=_page_faults(process),
+    )
+
+
+class ResourceSampler:
+    """Background thread polling CPU, RSS, I/O counters and context switches while a query runs.
+
+    Usage:
+        with ResourceSampler() as sampler:
+            run_query()
+        summary = sampler.summary()
+
+    A database server process can be attached with attach_server(); its CPU time, RSS,
+    I/O bytes and page faults are then sampled alongside the client and attributed to the query.
+    """
+
+    def __init__(self, process=None, interval_ms=None):
+        self.process = process or psutil.Process()
+        self.interval = (interval_ms if interval_ms is not None else DEFAULT_INTERVAL_MS) / 1000
+        self.snapshots = []
+        self.server = None
+        self.server_process = None
+        self.server_snapshots = []
+        self.phases = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot(self):
+        busy, total = _system_cpu_times()
+        cpu_times = self.process.cpu_times()
+        ctx = self.process.num_ctx_switches()
+        read_bytes, write_bytes = _io_counters(self.process)
+        return Snapshot(
+            timestamp=time.perf_counter(),
+            system_busy=busy,
+            system_total=total,
+            process_cpu=cpu_times.user + cpu_times.system,
+            rss=self.process.memory_info().rss,
+            read_bytes=read_bytes,
+            write_bytes=write_bytes,
+            ctx_switches=ctx.voluntary + ctx.involuntary,
+        )
+
+    def _sample_server(self):
+        server = self.server
+        if server is None:
+            return
+        try:
+            self.server_snapshots.append(_server_snapshot(server))
+        except psutil.Error:
+            # Backend mógł się już zakończyć (np. po zamknięciu połączenia)
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.snapshots.append(self._snapshot())
+            self._sample_server()
+
+    def record_phase(self, name, seconds):
+        """Records time spent outside the query itself (connect, server lookup) to be reported separately."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def attach_server(self, find_process):
+        """Starts tracking the server process returned by find_process().
+
+        The lookup time is recorded as the 'server_lookup' phase so it is excluded from the query time.
+        """
+        start_time = time.perf_counter()
+        try:
+            process = find_process()
+            if process is not None:
+                self.server_snapshots = [_server_snapshot(process)]
+                self.server = self.server_process = process
+        except psutil.Error as e:
+            print(f"Server process metrics unavailable: {e}")
+        self.record_phase('server_lookup', time.perf_counter() - start_time)
+
+    def detach_server(self):
+        """Takes the final server snapshot; call before closing a connection whose backend exits with it."""
+        self._sample_server()
+        self.server = None
+
+    def start(self):
+        self.snapshots = [self._snapshot()]
+        self.server = None
+        self.server_process = None
+        self.server_snapshots = []
+        self.phases = {}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.snapshots.append(self._snapshot())
+        self._sample_server()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    @property
+    def series(self):
+        """Per-interval time series; each point covers the interval ending at 't'."""
+        first = self.snapshots[0]
+        points = []
+        for prev, cur in zip(self.snapshots, self.snapshots[1:]):
+            elapsed = cur.timestamp - prev.timestamp
+            if elapsed <= 0:
+                continue
+            system_delta = cur.system_total - prev.system_total
+            points.append({
+                't': cur.timestamp - first.timestamp,
+                'cpu': 100 * (cur.system_busy - prev.system_busy) / system_delta if system_delta > 0 else 0.0,
+                'process_cpu': 100 * (cur.process_cpu - prev.process_cpu) / elapsed,
+                'rss_mb': cur.rss / MB,
+                'read_mb': (cur.read_bytes - first.read_bytes) / MB if cur.read_bytes is not None else None,
+                'write_mb': (cur.write_bytes - first.write_bytes) / MB if cur.write_bytes is not None else None,
+                'ctx_switches': cur.ctx_switches - first.ctx_switches,
+            })
+        return points
+
+    @property
+    def server_series(self):
+        """Per-interval CPU and RSS of the attached server process."""
+        snapshots = sorted(self.server_snapshots, key=lambda s: s.timestamp)
+        if not snapshots:
+            return []
+        first = self.snapshots[0]
+        points = []
+        for prev, cur in zip(snapshots, snapshots[1:]):
+            elapsed = cur.timestamp - prev.timestamp
+            if elapsed <= 0:
+                continue
+            points.append({
+                't': cur.timestamp - first.timestamp,
+                'cpu': 100 * (cur.cpu_time - prev.cpu_time) / elapsed,
+                'rss_mb': cur.rss / MB,
+            })
+        return points
+
+    def server_summary(self):
+        """CPU time, RSS delta, I/O bytes and page faults of the server process during the query."""
+        snapshots = sorted(self.server_snapshots, key=lambda s: s.timestamp)
+        if len(snapshots) < 2:
+            return None
+        first, last = snapshots[0], snapshots[-1]
+
+        def delta(field, scale=1):
+            before, after = getattr(first, field), getattr(last, field)
+            if before is None or after is None:
+                return None
+            return (after - before) / scale
+
+        try:
+            name = self.server_process.name()
+        except psutil.Error:
+            name = 'unknown'
+        return {
+            'name': name,
+            'pid': self.server_process.pid,
+            'cpu_time': delta('cpu_time'),
+            'rss_delta_mb': delta('rss', MB),
+            'max_rss_mb': max(s.rss for s in snapshots) / MB,
+            'read_mb': delta('read_bytes', MB),
+            'write_mb': delta('write_bytes', MB),
+            'page_faults': delta('page_faults'),
+        }
+
+    def summary(self):
+        """Time-weighted averages, peaks and totals over the sampled period."""
+        first, last = self.snapshots[0], self.snapshots[-1]
+        points = self.series
+        duration = points[-1]['t'] if points else 0.0
+
+        def weighted(key):
+            if duration <= 0:
+                return points[-1][key] if points else 0.0
+            prev_t = 0.0
+            acc = 0.0
+            for point in points:
+                acc += point[key] * (point['t'] - prev_t)
+                prev_t = point['t']
+            return acc / duration
+
+        # RSS to wartość chwilowa, więc całkujemy metodą trapezów
+        rss_area = 0.0
+        for prev, cur in zip(self.snapshots, self.snapshots[1:]):
+            rss_area += (prev.rss + cur.rss) / 2 * (cur.timestamp - prev.timestamp)
+        span = last.timestamp - first.timestamp
+        avg_rss = rss_area / span if span > 0 else last.rss
+
+        return {
+            'avg_cpu': weighted('cpu'),
+            'max_cpu': max((p['cpu'] for p in points), default=0.0),
+            'avg_process_cpu': weighted('process_cpu'),
+            'max_process_cpu': max((p['process_cpu'] for p in points), default=0.0),
+            'avg_ram': avg_rss / MB,
+            'max_ram': max(s.rss for s in self.snapshots) / MB,
+            'io_read_mb': (last.read_bytes - first.read_bytes) / MB if last.read_bytes is not None else 0.0,
+            'io_write_mb': (last.write_bytes - first.write_bytes) / MB if last.write_bytes is not None else 0.0,
+            'ctx_switches': last.ctx_switches - first.ctx_switches,
+            'samples': len(self.snapshots),
+            'interval_ms': self.interval * 1000,
+        }
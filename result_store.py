@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Append-only result store for the checkout benchmarks.
+
+Every measured query is written as one typed record (JSON Lines), partitioned by run and
+keyed by dataset, engine and query:
+
+    results/run=<run_id>/dataset=<dataset>/engine=<engine>/results.jsonl     one row per query
+    results/run=<run_id>/dataset=<dataset>/engine=<engine>/timeseries.jsonl  one row per sample
+    results/run=<run_id>/dataset=<dataset>/engine=<engine>/plans.jsonl       full execution plans
+    results/run=<run_id>/result.txt                                           human-readable log
+    results/run=<run_id>/run.json                                             environment fingerprint
+
+Each (dataset, engine) suite writes only its own partition, so parallel suites never share a
+file. compact_run() rewrites a finished run as Parquet when pyarrow is installed; readers
+take Parquet where present and JSON Lines otherwise.
+"""
+import glob
+import json
+import os
+import time
+
+RESULTS_DIR = os.getenv('RESULTS_DIR', 'results')
+
+TABLES = ['results', 'timeseries', 'plans']
+
+
+def new_run_id():
+    return time.strftime('%Y%m%dT%H%M%S') + f"-{os.getpid()}"
+
+
+# Identyfikator przebiegu; run_all_checkout ustawia go jawnie (także w procesach roboczych)
+RUN_ID = os.getenv('BENCH_RUN_ID') or new_run_id()
+
+
+def run_dir(run_id=None):
+    return os.path.join(RESULTS_DIR, f"run={run_id or RUN_ID}")
+
+
+def log_file(run_id=None):
+    """Human-readable result.txt log of a run, kept next to its records."""
+    return os.path.join(run_dir(run_id), "result.txt")
+
+
+def partition_dir(dataset, engine, run_id=None):
+    return os.path.join(run_dir(run_id), f"dataset={dataset}", f"engine={engine}")
+
+
+def append(table, dataset, engine, records, run_id=None):
+    """Appends records to one table of the (dataset, engine) partition of a run."""
+    directory = partition_dir(dataset, engine, run_id)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{table}.jsonl"), "a") as f:
+        for record in records:
+            # default=str dla typów BSON (ObjectId, Timestamp) w wynikach explain
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def list_runs():
+    """Run ids present in the store, oldest first."""
+    runs = [os.path.basename(path)[len("run="):] for path in glob.glob(os.path.join(RESULTS_DIR, "run=*"))]
+    return sorted(runs)
+
+
+def _partition_files(table, run_id):
+    files = []
+    for directory in sorted(glob.glob(os.path.join(run_dir(run_id), "dataset=*", "engine=*"))):
+        parquet = os.path.join(directory, f"{table}.parquet")
+        jsonl = os.path.join(directory, f"{table}.jsonl")
+        if os.path.exists(parquet):
+            files.append(parquet)
+        elif os.path.exists(jsonl):
+            files.append(jsonl)
+    return files
+
+
+def table_signature(table, run_id=None):
+    """(path, mtime, size) of every file of a table; changes whenever the run gets new records."""
+    signature = []
+    for path in _partition_files(table, run_id):
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def load_table(table, run_id=None):
+    """Reads one table of a run (default: the current run) into a DataFrame."""
+    import pandas as pd
+
+    frames = []
+    for path in _partition_files(table, run_id):
+        if path.endswith(".parquet"):
+            frames.append(pd.read_parquet(path))
+        else:
+            frames.append(pd.read_json(path, lines=True, dtype=False))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_new_records(table, positions, run_id=None):
+    """Records appended to a table since `positions`; updates positions in place.
+
+    positions maps each partition ("dataset=…/engine=…") to the byte offset and row count
+    already read, so a reader can tail a run while it is being written. Only complete lines
+    are consumed; a partition compacted to Parquet in the meantime continues at its row count.
+    """
+    records = []
+    base = run_dir(run_id)
+    for directory in sorted(glob.glob(os.path.join(base, "dataset=*", "engine=*"))):
+        name = os.path.relpath(directory, base).replace(os.sep, "/")
+        position = positions.get(name, {'offset': 0, 'rows': 0})
+        try:
+            with open(os.path.join(directory, f"{table}.jsonl"), "rb") as f:
+                f.seek(position['offset'])
+                chunk = f.read()
+        except FileNotFoundError:
+            parquet = os.path.join(directory, f"{table}.parquet")
+            if not os.path.exists(parquet):
+                continue
+            import pandas as pd
+
+            df = pd.read_parquet(parquet)
+            records.extend(df.iloc[position['rows']:].to_dict(orient='records'))
+            positions[name] = {'offset': position['offset'], 'rows': max(len(df), position['rows'])}
+            continue
+
+        end = chunk.rfind(b"\n") + 1
+        lines = chunk[:end].splitlines()
+        records.extend(json.loads(line) for line in lines)
+        positions[name] = {'offset': position['offset'] + end, 'rows': position['rows'] + len(lines)}
+    return records
+
+
+def write_run_info(info, run_id=None):
+    """Stores run metadata (environment fingerprint, dataset sizes) next to the run's records."""
+    os.makedirs(run_dir(run_id), exist_ok=True)
+    with open(os.path.join(run_dir(run_id), "run.json"), "w") as f:
+        json.dump(info, f, indent=2)
+
+
+def read_run_info(run_id=None):
+    """Run metadata written by write_run_info, or None for runs recorded without it."""
+    try:
+        with open(os.path.join(run_dir(run_id), "run.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def mark_complete(run_id=None):
+    """Marks a run as finished; live readers stop tailing it."""
+    open(os.path.join(run_dir(run_id), "_complete"), "w").close()
+
+
+def is_complete(run_id=None):
+    return os.path.exists(os.path.join(run_dir(run_id), "_complete"))
+
+
+def compact_run(run_id=None):
+    """Rewrites the JSON Lines tables of a finished run as Parquet (requires pyarrow)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is not installed, keeping the run as JSON Lines.")
+        return False
+
+    import pandas as pd
+
+    for table in TABLES:
+        for path in _partition_files(table, run_id):
+            if not path.endswith(".jsonl"):
+                continue
+            df = pd.read_json(path, lines=True, dtype=False)
+            df.to_parquet(path[:-len(".jsonl")] + ".parquet", index=False)
+            os.remove(path)
+    return True
@@ -1,97 +1,234 @@
 # -*- coding: utf-8 -*-
-import subprocess
+import argparse
 import os
+import shutil
 import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
-import re
-
-# Ścieżki do skryptów
-scripts = [
-    "appointments_database_checkout.py",
-    "flight_database_checkout.py",
-    "trip_database_checkout.py",
-    "appointments_MongoDB_checkout.py",
-    "flight_MongoDB_checkout.py",
-    "trip_MongoDB_checkout.py"
-]
-
-def run_script(script_name):
-    print(f"I am starting the script execution: {script_name}...")
-    result = subprocess.run(["python", script_name], capture_output=True, text=True)
-    if result.returncode == 0:
-        print(f"Script {script_name} completed successfully\n")
-    else:
-        print(f"An error occurred while executing the script {script_name}.\n")
-        print(result.stderr)
-
-
-def parse_results(file_path):
-    parsed_data = []
-    current_database = ""
-    current_query = 1  # Start from 1 and continue sequentially across all databases
-    mongo_query_start = 1  # Starting point for MongoDB numbering
-    in_mongo_section = False  # Tracks if we're in the MongoDB section
-
-    with open(file_path, "r") as file:
-        for line in file:
-            line = line.strip()
-
-            if line.startswith("DATABASE"):
-                current_database = line.replace("DATABASE ", "")
-
-                # Detect if we're in MongoDB databases section, reset numbering only for MongoDB
-                if "MongoDB" in current_database:
-                    if not in_mongo_section:  # Reset only when switching to MongoDB
-                        current_query = mongo_query_start
-                        in_mongo_section = True
-                else:
-                    in_mongo_section = False  # For PostgreSQL databases
-
-            elif line.startswith("Results for query:"):
-                # Record the query number for each query
-                parsed_data.append({"Baza danych": current_database, "Zapytanie": current_query})
-                current_query += 1
-
-            elif "Completion time:" in line:
-                execution_time = float(re.search(r"Completion time: ([\d.]+)", line).group(1))
-
-            elif "Average RAM usage" in line:
-                avg_ram, max_ram = map(float, re.findall(r"[\d.]+", line))
-
-            elif "Average CPU performance" in line:
-                avg_cpu, max_cpu = map(float, re.findall(r"[\d.]+", line))
-                parsed_data[-1].update({
-                    "Czas wykonania (s)": execution_time,
-                    "Średnie zużycie RAM (MB)": avg_ram,
-                    "Maksymalne zużycie RAM (MB)": max_ram,
-                    "Średnia wydajność CPU (%)": avg_cpu,
-                    "Maksymalna wydajność CPU (%)": max_cpu,
-                })
-
-    return parsed_data
-
-def save_to_excel(data, output_file):
-    """Save parsed data to an Excel file."""
-    df = pd.DataFrame(data)
-    df.to_excel(output_file, index=False)
+import psutil
+
+import benchmark_core
+import compare_data
+import result_store
+import run_history
+from benchmark_registry import DATASETS, ENGINES, load_module, select_workloads
+from db_connections import retain_shared_mongo_clients
+
+
+def run_workloads(workloads):
+    """Runs checkout suites in this interpreter, sharing imports, samplers and the Mongo client."""
+    with retain_shared_mongo_clients():
+        for workload in workloads:
+            print(f"I am starting the suite: {workload['module']}...")
+            try:
+                load_module(workload).main()
+                print(f"Suite {workload['module']} completed successfully\n")
+            except Exception:
+                print(f"An error occurred while executing the suite {workload['module']}.\n")
+                traceback.print_exc()
+
+def _part_file(file_name, dataset, engine):
+    root, ext = os.path.splitext(file_name)
+    return f"{root}.{dataset}.{engine}{ext}"
+
+def run_engine_suite(dataset, engine, cpus, run_id):
+    """Worker process: one engine's suite for one dataset, pinned to cpus, writing to its own part file."""
+    try:
+        psutil.Process().cpu_affinity(cpus)
+    except (AttributeError, psutil.Error):
+        print("CPU pinning is not supported on this platform, running unpinned.")
+
+    # Rekordy trafiają do własnej partycji (dataset, silnik) tego samego przebiegu
+    result_store.RUN_ID = run_id
+    benchmark_core.RESULT_FILE = _part_file(result_store.log_file(run_id), dataset, engine)
+    run_workloads(select_workloads([dataset], [engine]))
+
+def merge_part_files(workloads):
+    """Concatenates the per-(dataset, engine) result.txt logs in registry order."""
+    with open(result_store.log_file(), "a") as merged:
+        for workload in workloads:
+            part = _part_file(result_store.log_file(), workload['dataset'], workload['engine'])
+            if os.path.exists(part):
+                with open(part, "r") as f:
+                    shutil.copyfileobj(f, merged)
+                os.remove(part)
+
+def run_parallel(workloads):
+    """Runs the PostgreSQL and MongoDB suites of each dataset at the same time on separate cores.
+
+    Each engine gets its own worker process pinned to half of the CPUs, so the client-side
+    samplers do not measure each other. Server processes are not pinned. Both workers write
+    into the current run of the result store.
+    """
+    cpus = list(range(psutil.cpu_count()))
+    half = max(len(cpus) // 2, 1)
+    cpu_sets = {'postgresql': cpus[:half], 'mongodb': cpus[half:] or cpus}
+
+    datasets = [d for d in DATASETS if any(w['dataset'] == d for w in workloads)]
+    for dataset in datasets:
+        engines = [w['engine'] for w in workloads if w['dataset'] == dataset]
+        print(f"Running {', '.join(engines)} suites for '{dataset}' in parallel...")
+        with ProcessPoolExecutor(len(engines)) as executor:
+            futures = [executor.submit(run_engine_suite, dataset, engine, cpu_sets[engine],
+                                       result_store.RUN_ID) for engine in engines]
+            for future in futures:
+                future.result()
+    merge_part_files(workloads)
+
+
+# Kolumny rekordów result_store i ich nazwy w arkuszu porównawczym (tak samo jak w compare_databases.xlsx)
+EXCEL_COLUMNS = {
+    "section": "Baza danych",
+    "query_number": "Zapytanie",
+    "execution_time": "Czas wykonania (s)",
+    "avg_ram": "Średnie zużycie RAM (MB)",
+    "max_ram": "Maksymalne zużycie RAM (MB)",
+    "avg_cpu": "Średnia wydajność CPU (%)",
+    "max_cpu": "Maksymalna wydajność CPU (%)",
+    "avg_process_cpu": "Średnie CPU procesu (%)",
+    "max_process_cpu": "Maksymalne CPU procesu (%)",
+    "io_read_mb": "Odczyt I/O (MB)",
+    "io_write_mb": "Zapis I/O (MB)",
+    "ctx_switches": "Przełączenia kontekstu",
+    "samples": "Liczba próbek",
+    "iterations": "Iteracje",
+    "warmup": "Rozgrzewka",
+    "time_min": "Czas min (s)",
+    "time_median": "Czas mediana (s)",
+    "time_mean": "Czas średni (s)",
+    "time_p95": "Czas p95 (s)",
+    "time_p99": "Czas p99 (s)",
+    "time_std": "Odchylenie std (s)",
+    "time_ci_low": "CI95 dolny (s)",
+    "time_ci_high": "CI95 górny (s)",
+    "connect_time": "Czas połączenia (s)",
+    "connection_mode": "Tryb połączenia",
+    "client_setup_s": "Przygotowanie klienta (s)",
+    "first_connection_s": "Pierwsze połączenie (s)",
+    "server_name": "Proces serwera",
+    "server_cpu_time": "CPU serwera (s)",
+    "server_rss_delta_mb": "Zmiana RAM serwera (MB)",
+    "server_read_mb": "Odczyt serwera (MB)",
+    "server_write_mb": "Zapis serwera (MB)",
+    "server_page_faults": "Błędy stron serwera",
+    "plan_planning_ms": "Planowanie (ms)",
+    "plan_execution_ms": "Wykonanie na serwerze (ms)",
+    "plan_rows_examined": "Wiersze przejrzane",
+    "plan_rows_returned": "Wiersze zwrócone",
+    "plan_buffer_hits": "Bufory trafione",
+    "plan_buffer_reads": "Bufory odczytane",
+    "plan_indexes": "Indeksy",
+    "plan_lookup_stages": "Etapy $lookup",
+    "plan_lookup_ms": "Czas $lookup (ms)",
+}
+
+TIMESERIES_COLUMNS = {
+    "section": "Baza danych",
+    "query_number": "Zapytanie",
+    "iteration": "Iteracja",
+    "t": "Czas (s)",
+    "cpu": "CPU (%)",
+    "process_cpu": "CPU procesu (%)",
+    "rss_mb": "RAM (MB)",
+    "read_mb": "Odczyt I/O (MB)",
+    "write_mb": "Zapis I/O (MB)",
+    "ctx_switches": "Przełączenia kontekstu",
+}
+
+# Kolumny zawsze obecne w arkuszu; pozostałe tylko wtedy, gdy przebieg je zmierzył
+_REQUIRED_EXCEL_COLUMNS = ["Baza danych", "Zapytanie", "Czas wykonania (s)"]
+
+def number_queries(results):
+    """Adds 'query_number': PostgreSQL queries numbered across datasets in registry order, then MongoDB from 1."""
+    results = results.assign(
+        _engine_order=results["engine"].map({engine: i for i, engine in enumerate(ENGINES)}),
+        _dataset_order=results["dataset"].map({dataset: i for i, dataset in enumerate(DATASETS)}),
+    ).sort_values(["_engine_order", "_dataset_order", "query_index"])
+    results["query_number"] = results.groupby("engine").cumcount() + 1
+    return results.drop(columns=["_engine_order", "_dataset_order"])
+
+def save_to_excel(run_id, output_file):
+    """Exports one run of the result store (results + client time series) to an Excel file."""
+    results = result_store.load_table("results", run_id)
+    if results.empty:
+        print(f"No results stored for run {run_id}")
+        return
+    results = number_queries(results)
+    sheet = results[[c for c in EXCEL_COLUMNS if c in results.columns]].rename(columns=EXCEL_COLUMNS)
+    optional = [c for c in sheet.columns if c not in _REQUIRED_EXCEL_COLUMNS]
+    sheet = sheet.drop(columns=[c for c in optional if sheet[c].isna().all()])
+
+    timeseries = result_store.load_table("timeseries", run_id)
+    if not timeseries.empty:
+        keys = ["dataset", "engine", "section", "query_index"]
+        timeseries = timeseries[timeseries["source"] == "client"].merge(
+            results[keys + ["query_number"]], on=keys
+        )
+        timeseries = timeseries[list(TIMESERIES_COLUMNS)].rename(columns=TIMESERIES_COLUMNS)
+
+    with pd.ExcelWriter(output_file) as writer:
+        sheet.to_excel(writer, sheet_name="Wyniki", index=False)
+        if not timeseries.empty:
+            timeseries.to_excel(writer, sheet_name="Szeregi czasowe", index=False)
     print(f"Results saved to file {output_file}")
 
 def main():
-    # Check if result.txt exists
-    if os.path.exists("result.txt"):
-        print("File 'result.txt' already exists. Delete it before starting the program")
+    parser = argparse.ArgumentParser(description="Run all checkout suites and save the comparison to Excel.")
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, help="datasets to run (default: all)")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, help="engines to run (default: all)")
+    parser.add_argument('--parallel', action='store_true',
+                        help="run the PostgreSQL and MongoDB suites of each dataset at the same time")
+    parser.add_argument('--export-run', metavar='RUN_ID',
+                        help="only export an existing run of the result store to Excel")
+    parser.add_argument('--baseline', metavar='RUN_ID',
+                        help="run to compare against (default: marked baseline or previous run)")
+    parser.add_argument('--output', default="database_performance_comparison.xlsx", help="Excel export file")
+    parser.add_argument('--publish', action='store_true',
+                        help=f"also publish the export as {compare_data.DATA_FILE} and rebuild the /compare snapshot")
+    args = parser.parse_args()
+
+    if args.export_run:
+        save_to_excel(args.export_run, args.output)
+        return
+
+    # Każdy przebieg ma własny katalog w result_store, więc nic nie jest nadpisywane
+    run_id = result_store.RUN_ID
+    if os.path.exists(result_store.log_file()):
+        print(f"Run '{run_id}' already exists in {result_store.RESULTS_DIR}. Use a different BENCH_RUN_ID")
         sys.exit(1)
-
-    # Run each script
-    for script in scripts:
-        run_script(script)
-
-    # Parse results from result.txt
-    parsed_data = parse_results("result.txt")
-
-    # Save parsed data to Excel
-    save_to_excel(parsed_data, "database_performance_comparison.xlsx")
+    os.makedirs(result_store.run_dir(), exist_ok=True)
+    benchmark_core.RESULT_FILE = result_store.log_file()
+
+    workloads = select_workloads(args.datasets, args.engines)
+    print(f"Run {run_id}, results stored in {result_store.run_dir()}")
+    fingerprint, dataset_sizes = run_history.environment_fingerprint(workloads)
+    recorded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    result_store.write_run_info({'fingerprint': fingerprint, 'dataset_sizes': dataset_sizes,
+                                 'recorded_at': recorded_at})
+    if args.parallel:
+        run_parallel(workloads)
+    else:
+        run_workloads(workloads)
+    result_store.compact_run()
+    result_store.mark_complete()
+
+    # Excel to tylko eksport przebiegu z result_store
+    save_to_excel(run_id, args.output)
+    if args.publish and os.path.exists(args.output):
+        shutil.copyfile(args.output, compare_data.DATA_FILE)
+        compare_data.write_snapshot()
+        print(f"Published to {compare_data.DATA_FILE}")
+
+    # Historia przebiegów i porównanie z bazowym
+    conn = run_history.record_run(run_id, fingerprint, dataset_sizes, recorded_at=recorded_at)
+    baseline_id = args.baseline or run_history.default_baseline(run_id, conn)
+    if baseline_id:
+        run_history.print_comparison(run_id, baseline_id, conn)
+    else:
+        print(f"No baseline run yet; mark one with: python run_history.py baseline {run_id}")
 
 
 if __name__ == "__main__":
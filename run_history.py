@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""Persistent run history with performance-regression detection.
+
+Every run of run_all_checkout is recorded in a SQLite database together with an environment
+fingerprint (host, Python, driver and server versions) and the size of each dataset. Per-query
+timings of a run are compared against a baseline run: a query is flagged when the bootstrap CI
+of the median ratio (current / baseline) lies entirely outside 1 and the change is larger than
+REGRESSION_THRESHOLD. Queries of a dataset whose size differs from the baseline get no
+regression/speedup verdict, since their timings are not comparable.
+
+Example:
+    python run_history.py list
+    python run_history.py baseline 20261017T101500-4242
+    python run_history.py compare 20261018T093000-5151 --baseline 20261017T101500-4242
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from importlib import metadata
+
+import psutil
+
+import result_store
+from benchmark_registry import load_module
+from query_statistics import bootstrap_ratio_ci
+
+HISTORY_DB = os.getenv('HISTORY_DB', 'run_history.sqlite')
+
+# Minimalna względna zmiana mediany uznawana za regresję/przyspieszenie (0.05 = 5%)
+REGRESSION_THRESHOLD = float(os.getenv('REGRESSION_THRESHOLD', '0.05'))
+
+# Poniżej tej liczby iteracji po obu stronach przedział bootstrap nie ma sensu
+MIN_ITERATIONS = 3
+
+# Względna różnica liczby wierszy uznawana za inny rozmiar danych (reltuples w PostgreSQL to szacunek)
+DATASET_SIZE_TOLERANCE = 0.01
+
+_DRIVERS = ['psycopg2', 'psycopg2-binary', 'pymongo', 'motor', 'asyncpg', 'pandas']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    is_baseline INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT NOT NULL,
+    dataset_sizes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_stats (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    dataset TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    section TEXT NOT NULL,
+    query_index INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    iterations INTEGER,
+    median REAL,
+    mean REAL,
+    p95 REAL,
+    std REAL,
+    ci_low REAL,
+    ci_high REAL,
+    iteration_times TEXT,
+    PRIMARY KEY (run_id, section, query_index)
+);
+"""
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or HISTORY_DB)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _postgres_info(module):
+    import psycopg2
+
+    conn = psycopg2.connect(**module.DATABASE_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW server_version;")
+            version = cursor.fetchone()[0]
+            # reltuples to szacunek z ANALYZE - bez pełnego COUNT(*) na dużych tabelach
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relkind = 'r' AND n.nspname = 'public' ORDER BY relname;"
+            )
+            sizes = dict(cursor.fetchall())
+    finally:
+        conn.close()
+    return version, sizes
+
+
+def _mongo_info(module):
+    from pymongo import MongoClient
+
+    client = MongoClient(module.MONGODB_URI)
+    try:
+        version = client.admin.command('buildInfo')['version']
+        db = client[module.DATABASE_NAME]
+        sizes = {name: db[name].estimated_document_count() for name in sorted(db.list_collection_names())}
+    finally:
+        client.close()
+    return version, sizes
+
+
+def environment_fingerprint(workloads):
+    """Host, Python and driver versions plus server version and table sizes per (dataset, engine)."""
+    fingerprint = {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': psutil.cpu_count(),
+        'memory_gb': round(psutil.virtual_memory().total / 1024 ** 3, 1),
+        'drivers': {name: version for name in _DRIVERS if (version := _package_version(name))},
+        'servers': {},
+    }
+    dataset_sizes = {}
+    for workload in workloads:
+        key = f"{workload['dataset']}/{workload['engine']}"
+        module = load_module(workload)
+        try:
+            if workload['engine'] == 'postgresql':
+                version, sizes = _postgres_info(module)
+            else:
+                version, sizes = _mongo_info(module)
+        except Exception as e:
+            print(f"Could not fingerprint {key}: {type(e).__name__}: {e}")
+            continue
+        fingerprint['servers'][key] = version
+        dataset_sizes[key] = sizes
+    return fingerprint, dataset_sizes
+
+
+def record_run(run_id, fingerprint, dataset_sizes, conn=None, recorded_at=None):
+    """Copies the per-query statistics of a stored run into the history database.
+
+    recorded_at (default: now) orders the runs when picking the previous run as baseline.
+    """
+    results = result_store.load_table('results', run_id)
+    conn = conn or connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (run_id, recorded_at, fingerprint, dataset_sizes) VALUES (?, ?, ?, ?)",
+            (run_id, recorded_at or time.strftime('%Y-%m-%dT%H:%M:%S'), json.dumps(fingerprint),
+             json.dumps(dataset_sizes)),
+        )
+        conn.execute("DELETE FROM query_stats WHERE run_id = ?", (run_id,))
+        conn.executemany(
+            "INSERT INTO query_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, row['dataset'], row['engine'], row['section'], int(row['query_index']), row['query'],
+                 int(row['iterations']), row['time_median'], row['time_mean'], row['time_p95'], row['time_std'],
+                 row['time_ci_low'], row['time_ci_high'], json.dumps(list(row['iteration_times'])))
+                for row in results.to_dict(orient='records')
+            ],
+        )
+    return conn
+
+
+def set_baseline(run_id, conn=None):
+    conn = conn or connect()
+    with conn:
+        if conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is None:
+            raise ValueError(f"Unknown run: {run_id}")
+        conn.execute("UPDATE runs SET is_baseline = (run_id = ?)", (run_id,))
+
+
+def default_baseline(run_id, conn):
+    """The marked baseline run, or else the newest run recorded before run_id."""
+    row = conn.execute("SELECT run_id FROM runs WHERE is_baseline = 1 AND run_id != ?", (run_id,)).fetchone()
+    if row is None:
+        # Po czasie zapisu, nie po identyfikatorze - id zadań (job-<hex>) nie są uporządkowane w czasie
+        row = conn.execute(
+            "SELECT run_id FROM runs WHERE run_id != ? "
+            "AND recorded_at < (SELECT recorded_at FROM runs WHERE run_id = ?) "
+            "ORDER BY recorded_at DESC LIMIT 1", (run_id, run_id)
+        ).fetchone()
+    return row['run_id'] if row else None
+
+
+def _fingerprint_changes(baseline, current):
+    changes = []
+    for key in ('platform', 'python', 'cpu_count', 'memory_gb'):
+        if baseline.get(key) != current.get(key):
+            changes.append(f"{key}: {baseline.get(key)} -> {current.get(key)}")
+    for group in ('drivers', 'servers'):
+        names = sorted(set(baseline.get(group, {})) | set(current.get(group, {})))
+        for name in names:
+            before, after = baseline.get(group, {}).get(name), current.get(group, {}).get(name)
+            if before != after:
+                changes.append(f"{name}: {before} -> {after}")
+    return changes
+
+
+def _dataset_size_changes(baseline, current):
+    """Table size changes per 'dataset/engine' key present in both runs."""
+    changes = {}
+    for key in sorted(set(baseline) & set(current)):
+        tables = sorted(set(baseline[key]) | set(current[key]))
+        for table in tables:
+            before, after = baseline[key].get(table), current[key].get(table)
+            if before is None or after is None:
+                differs = before != after
+            else:
+                differs = abs(after - before) > DATASET_SIZE_TOLERANCE * max(before, after, 1)
+            if differs:
+                changes.setdefault(key, []).append(f"{table}: {before} -> {after}")
+    return changes
+
+
+def _run_metadata(conn, run_ids):
+    return {
+        row['run_id']: (json.loads(row['fingerprint']), json.loads(row['dataset_sizes']))
+        for row in conn.execute(
+            f"SELECT run_id, fingerprint, dataset_sizes FROM runs WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+            run_ids,
+        )
+    }
+
+
+def compare_runs(run_id, baseline_id, conn=None):
+    """Per-query median ratio (current / baseline) with a bootstrap CI and a verdict.
+
+    Queries of a (dataset, engine) whose table sizes differ from the baseline get the verdict
+    'dataset size changed' instead of regression/speedup.
+    """
+    conn = conn or connect()
+    metadata_by_run = _run_metadata(conn, [run_id, baseline_id])
+    size_changes = _dataset_size_changes(metadata_by_run.get(baseline_id, ({}, {}))[1],
+                                         metadata_by_run.get(run_id, ({}, {}))[1])
+    rows = conn.execute(
+        "SELECT c.dataset, c.engine, c.section, c.query_index, c.query, "
+        "b.iteration_times AS baseline_times, c.iteration_times AS current_times "
+        "FROM query_stats c JOIN query_stats b "
+        "ON b.section = c.section AND b.query_index = c.query_index AND b.query = c.query "
+        "WHERE c.run_id = ? AND b.run_id = ? ORDER BY c.engine DESC, c.dataset, c.query_index",
+        (run_id, baseline_id),
+    ).fetchall()
+
+    comparisons = []
+    for row in rows:
+        baseline_times = json.loads(row['baseline_times'])
+        current_times = json.loads(row['current_times'])
+        ratio = statistics.median(current_times) / statistics.median(baseline_times)
+        ci_low = ci_high = None
+        if f"{row['dataset']}/{row['engine']}" in size_changes:
+            verdict = 'dataset size changed'
+        elif min(len(baseline_times), len(current_times)) < MIN_ITERATIONS:
+            verdict = 'insufficient data'
+        else:
+            ci_low, ci_high = bootstrap_ratio_ci(baseline_times, current_times)
+            if ci_low > 1 + REGRESSION_THRESHOLD:
+                verdict = 'regression'
+            elif ci_high < 1 - REGRESSION_THRESHOLD:
+                verdict = 'speedup'
+            else:
+                verdict = 'unchanged'
+        comparisons.append({
+            'dataset': row['dataset'],
+            'engine': row['engine'],
+            'section': row['section'],
+            'query_index': row['query_index'],
+            'query': row['query'],
+            'ratio': ratio,
+            'ci_low': ci_low,
+            'ci_high': ci_high,
+            'verdict': verdict,
+        })
+    return comparisons
+
+
+def print_comparison(run_id, baseline_id, conn=None):
+    conn = conn or connect()
+    metadata_by_run = _run_metadata(conn, [run_id, baseline_id])
+    baseline_fingerprint, baseline_sizes = metadata_by_run.get(baseline_id, ({}, {}))
+    fingerprint, sizes = metadata_by_run.get(run_id, ({}, {}))
+    print(f"Run {run_id} compared with baseline {baseline_id}")
+    for change in _fingerprint_changes(baseline_fingerprint, fingerprint):
+        print(f"  environment changed - {change}")
+    for key, changes in _dataset_size_changes(baseline_sizes, sizes).items():
+        print(f"  dataset size changed - {key}: {', '.join(changes)} (no verdict for its queries)")
+
+    comparisons = compare_runs(run_id, baseline_id, conn)
+    for c in comparisons:
+        ci = "" if c['ci_low'] is None else f" CI95 [{c['ci_low']:.3f}, {c['ci_high']:.3f}]"
+        marker = "!!" if c['verdict'] == 'regression' else "  "
+        print(f"{marker}[{c['section']} #{c['query_index']}] {str(c['query'])[:60]}: "
+              f"x{c['ratio']:.3f}{ci} {c['verdict']}")
+    flagged = [c for c in comparisons if c['verdict'] in ('regression', 'speedup')]
+    print(f"{len(flagged)} of {len(comparisons)} queries changed significantly")
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run history and regression detection.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="list recorded runs")
+    baseline_parser = subparsers.add_parser('baseline', help="mark a run as the baseline")
+    baseline_parser.add_argument('run_id')
+    compare_parser = subparsers.add_parser('compare', help="compare a run with a baseline")
+    compare_parser.add_argument('run_id')
+    compare_parser.add_argument('--baseline', help="baseline run (default: marked baseline or previous run)")
+    record_parser = subparsers.add_parser('record', help="record a run of the result store")
+    record_parser.add_argument('run_id')
+    args = parser.parse_args()
+
+    conn = connect()
+    if args.command == 'list':
+        for row in conn.execute("SELECT run_id, recorded_at, is_baseline, fingerprint FROM runs ORDER BY recorded_at"):
+            servers = json.loads(row['fingerprint']).get('servers', {})
+            print(f"{'*' if row['is_baseline'] else ' '} {row['run_id']} {row['recorded_at']} "
+                  f"{', '.join(sorted(set(servers.values())))}")
+    elif args.command == 'baseline':
+        set_baseline(args.run_id, conn)
+        print(f"Baseline set to {args.run_id}")
+    elif args.command == 'record':
+        # Środowisko z chwili pomiaru zapisane przez run_all_checkout, nie bieżące
+        info = result_store.read_run_info(args.run_id)
+        if info is None:
+            print(f"Run {args.run_id} has no stored environment fingerprint (run.json)")
+            sys.exit(1)
+        record_run(args.run_id, info['fingerprint'], info['dataset_sizes'], conn, info.get('recorded_at'))
+        print(f"Run {args.run_id} recorded in {HISTORY_DB}")
+    else:
+        baseline_id = args.baseline or default_baseline(args.run_id, conn)
+        if baseline_id is None:
+            print("No baseline run to compare with")
+            return
+        print_comparison(args.run_id, baseline_id, conn)
+
+
+if __name__ == "__main__":
+    main()
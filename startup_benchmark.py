@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Cold-start benchmark of the web process.
+
+Each repetition starts a fresh interpreter that imports app (as a gunicorn worker would) and
+serves its first /compare request, reporting import time, time to first response, RSS and
+whether pandas got imported. Runs with and without the precomputed /compare snapshot.
+
+Example:
+    python startup_benchmark.py --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import compare_data
+
+STARTUP_RESULTS_FILE = "startup_results.jsonl"
+
+# Kod procesu potomnego: pomiar od startu interpretera do pierwszej odpowiedzi /compare
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import psutil
+import app
+imported = time.perf_counter()
+import_rss = psutil.Process().memory_info().rss
+response = app.app.test_client().get('/compare')
+served = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_s': imported - start,
+    'first_response_s': served - imported,
+    'import_rss_mb': import_rss / 1024 / 1024,
+    'rss_mb': psutil.Process().memory_info().rss / 1024 / 1024,
+    'pandas_loaded': 'pandas' in sys.modules,
+}))
+"""
+
+
+def run_child(env):
+    output = subprocess.run([sys.executable, "-c", _CHILD], env=env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def benchmark(scenario, env, repeat):
+    runs = [run_child(env) for _ in range(repeat)]
+    record = {'scenario': scenario, 'repeat': repeat, 'pandas_loaded': any(r['pandas_loaded'] for r in runs)}
+    for field in ('import_s', 'first_response_s', 'import_rss_mb', 'rss_mb'):
+        record[field] = statistics.median(r[field] for r in runs)
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the web process.")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh processes per scenario")
+    args = parser.parse_args()
+
+    compare_data.write_snapshot()
+    env = dict(os.environ)
+    records = [benchmark('snapshot', env, args.repeat)]
+
+    # Brak migawki: pierwsze żądanie parsuje arkusz (ścieżka sprzed migawek); katalog nie istnieje,
+    # więc żaden przebieg nie zostawia migawki następnemu
+    with tempfile.TemporaryDirectory() as directory:
+        env_cold = dict(env, COMPARE_CACHE_FILE=os.path.join(directory, "missing", "snapshot.json"))
+        records.append(benchmark('no snapshot', env_cold, args.repeat))
+
+    for record in records:
+        print(
+            f"[{record['scenario']}] import {record['import_s'] * 1000:.0f} ms, "
+            f"first /compare {record['first_response_s'] * 1000:.1f} ms, "
+            f"RSS after import {record['import_rss_mb']:.1f} MB, after first request {record['rss_mb']:.1f} MB, "
+            f"pandas loaded: {record['pandas_loaded']}"
+        )
+    with open(STARTUP_RESULTS_FILE, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {STARTUP_RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
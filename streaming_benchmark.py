@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Large-result streaming mode for the checkout workloads.
+
+Raises (or drops) the outer LIMIT of each query and streams the result instead of
+fetchall()/list(): PostgreSQL through a psycopg2 named (server-side) cursor with a tunable
+itersize, MongoDB through a cursor with a tunable batch_size. Reports rows/s, MB/s,
+time to first row and peak client memory for each result size.
+
+Example:
+    python streaming_benchmark.py --workload flight --engine postgresql --limits 1000 100000 0
+    python streaming_benchmark.py --workload trip --engine mongodb --limits 10000 0 --batch-size 5000
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from benchmark_registry import DATASETS, ENGINES
+from benchmark_core import measure_once
+from load_test import load_workload, query_label
+from mongo_operations import build_cursor, record_operation
+
+STREAMING_RESULTS_FILE = "streaming_results.jsonl"
+
+# Wielkość paczek pobieranych z serwera
+STREAM_ITERSIZE = int(os.getenv('STREAM_ITERSIZE', '2000'))
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '1000'))
+
+# Zewnętrzny LIMIT na końcu zapytania SQL (LIMIT w podzapytaniach zostaje bez zmian)
+_TRAILING_LIMIT = re.compile(r"\s*LIMIT\s+\d+\s*;?\s*$", re.IGNORECASE)
+
+MB = 1024 * 1024
+
+
+def with_limit_sql(query, limit):
+    """Replaces the trailing LIMIT of a SQL query; limit=None drops it."""
+    body = _TRAILING_LIMIT.sub("", query).rstrip().rstrip(';')
+    return f"{body} LIMIT {limit};" if limit else f"{body};"
+
+
+def with_limit_pipeline(pipeline, limit):
+    """Replaces the final top-level $limit stage of a pipeline; limit=None drops it."""
+    stages = list(pipeline)
+    if stages and '$limit' in stages[-1]:
+        stages.pop()
+    if limit:
+        stages.append({'$limit': limit})
+    return stages
+
+
+def _payload_bytes(row):
+    # Przybliżony rozmiar danych po dekodowaniu; dla Mongo obejmuje nazwy pól w każdym dokumencie
+    return len(repr(row))
+
+
+def _consume(rows, stats, start_time):
+    """Iterates the result; time to first row counts from start_time (just before the query is sent)."""
+    for row in rows:
+        if stats['rows'] == 0:
+            stats['time_to_first_row'] = time.perf_counter() - start_time
+        stats['rows'] += 1
+        stats['bytes'] += _payload_bytes(row)
+
+
+def stream_postgres(module, query, limit, itersize, stats):
+    with module.connect_to_db() as conn:
+        # Kursor nazwany = kursor po stronie serwera, wiersze przychodzą paczkami po itersize
+        with conn.cursor(name='streaming_benchmark') as cursor:
+            cursor.itersize = itersize
+            start_time = time.perf_counter()
+            cursor.execute(with_limit_sql(query, limit))
+            _consume(cursor, stats, start_time)
+
+
+def stream_mongo(module, query, limit, batch_size, stats):
+    with module.connect_to_mongodb() as db:
+        collection = db[query['collection']]
+        # Zegar przed aggregate(): ono od razu wykonuje polecenie i pobiera pierwszą paczkę,
+        # więc start w _consume pomijałby wykonanie na serwerze (find() i kursor nazwany są leniwe)
+        start_time = time.perf_counter()
+        if 'pipeline' in query:
+            cursor = collection.aggregate(with_limit_pipeline(query['pipeline'], limit), batchSize=batch_size)
+        else:
+            cursor = build_cursor(collection, record_operation(query['operation']), skip_calls=('limit',))
+            if limit:
+                cursor = cursor.limit(limit)
+            cursor = cursor.batch_size(batch_size)
+        _consume(cursor, stats, start_time)
+
+
+def run_streaming(workload, engine, limits, itersize=None, batch_size=None, query_index=None):
+    """Streams every query at each result size and returns one record per (query, limit)."""
+    module = load_workload(workload, engine)
+    itersize = itersize or STREAM_ITERSIZE
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    query_indexes = [query_index] if query_index is not None else list(range(len(module.queries)))
+
+    records = []
+    try:
+        for index in query_indexes:
+            query = module.queries[index]
+            for limit in limits:
+                stats = {'rows': 0, 'bytes': 0, 'time_to_first_row': None}
+                if engine == 'postgresql':
+                    execute = lambda sampler: stream_postgres(module, query, limit, itersize, stats)
+                else:
+                    execute = lambda sampler: stream_mongo(module, query, limit, batch_size, stats)
+                summary, _ = measure_once(execute)
+
+                elapsed = summary['execution_time']
+                records.append({
+                    'workload': workload,
+                    'engine': engine,
+                    'query': query_label(query),
+                    'limit': limit,
+                    'fetch_size': itersize if engine == 'postgresql' else batch_size,
+                    'rows': stats['rows'],
+                    'payload_mb': stats['bytes'] / MB,
+                    'elapsed_s': elapsed,
+                    'rows_per_s': stats['rows'] / elapsed if elapsed > 0 else 0.0,
+                    'mb_per_s': stats['bytes'] / MB / elapsed if elapsed > 0 else 0.0,
+                    'time_to_first_row_s': stats['time_to_first_row'],
+                    'peak_client_ram_mb': summary['max_ram'],
+                })
+    finally:
+        module.connector.close()
+    return records
+
+
+def print_records(records):
+    for record in records:
+        first_row = record['time_to_first_row_s']
+        print(
+            f"[{record['engine']} {record['workload']} limit={record['limit'] or 'none'}] "
+            f"{str(record['query'])[:60]}: {record['rows']} rows, {record['rows_per_s']:.0f} rows/s, "
+            f"{record['mb_per_s']:.2f} MB/s, first row "
+            f"{'n/a' if first_row is None else f'{first_row * 1000:.2f} ms'}, "
+            f"peak RAM {record['peak_client_ram_mb']:.1f} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Large-result streaming mode for the checkout workloads.")
+    parser.add_argument('--workload', choices=DATASETS, required=True)
+    parser.add_argument('--engine', choices=ENGINES, required=True)
+    parser.add_argument('--limits', type=int, nargs='+', default=[1000, 100000, 0],
+                        help="result sizes to test; 0 removes the limit")
+    parser.add_argument('--itersize', type=int, help="rows per round trip for the PostgreSQL named cursor")
+    parser.add_argument('--batch-size', type=int, help="documents per batch for the MongoDB cursor")
+    parser.add_argument('--query', type=int, help="run only this query (index in the queries list)")
+    args = parser.parse_args()
+
+    limits = [limit or None for limit in args.limits]
+    records = run_streaming(args.workload, args.engine, limits, args.itersize, args.batch_size, args.query)
+    print_records(records)
+    with open(STREAMING_RESULTS_FILE, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {STREAMING_RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
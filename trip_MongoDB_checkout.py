@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import os
-import time
-import psutil
-from pymongo import MongoClient
-from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from benchmark_core import measure, report_results, report_setup, start_section, write_section_line
+from db_connections import MongoConnector
+from query_plans import CAPTURE_PLANS, explain_mongo
+from resource_sampler import SERVER_METRICS, find_mongod_process
+
 # Wczytywanie zmiennych środowiskowych z pliku .env
 load_dotenv()
 
@@ -15,32 +16,20 @@ MONGODB_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 DATABASE_NAME = 'trip'
 
 
-@contextmanager
-def connect_to_mongodb():
-    """Context manager dla połączenia z MongoDB."""
-    client = MongoClient(MONGODB_URI)
-    try:
-        db = client[DATABASE_NAME]
-        yield db
-    finally:
-        client.close()
+# Jeden MongoClient współdzielony przez cały zestaw zapytań (MONGO_CONNECTION_MODE=cold wyłącza)
+connector = MongoConnector(MONGODB_URI, DATABASE_NAME)
 
 
-def measure_query_performance(query):
-    """Wykonuje zapytanie MongoDB i mierzy czas wykonania, użycie RAM i CPU."""
+def connect_to_mongodb(sampler=None):
+    """Context manager dla połączenia z MongoDB (współdzielony klient lub cold, zob. MONGO_CONNECTION_MODE)."""
+    return connector.database(sampler)
 
-    # Monitorowanie procesu dla RAM i CPU
-    process = psutil.Process()
 
-    # Próbka początkowa RAM-u i CPU
-    ram_before = process.memory_info().rss / (1024 * 1024)
-    cpu_before = psutil.cpu_percent(interval=None)
-
-    # Start czasu wykonania zapytania
-    start_time = time.perf_counter()
-
-    # Wykonanie zapytania do bazy danych
-    with connect_to_mongodb() as db:
+def run_query(query, sampler=None):
+    """Wykonuje pojedyncze zapytanie MongoDB (find/operation lub pipeline agregacji)."""
+    with connect_to_mongodb(sampler) as db:
+        if sampler is not None and SERVER_METRICS:
+            sampler.attach_server(lambda: find_mongod_process(db))
         collection = db[query['collection']]
 
         # Wykonanie odpowiedniego typu zapytania
@@ -51,38 +40,18 @@ def measure_query_performance(query):
             # Wykonanie własnej operacji
             query['operation'](collection)
 
-        # Próbka w środku zapytania
-        mid_cpu = psutil.cpu_percent(interval=None)
-        mid_ram = process.memory_info().rss / (1024 * 1024)
 
-    # Koniec czasu wykonania zapytania
-    end_time = time.perf_counter()
-
-    # Próbka końcowa RAM-u i CPU
-    ram_after = process.memory_info().rss / (1024 * 1024)
-    cpu_after = psutil.cpu_percent(interval=None)
-
-    # Obliczenia wyników
-    execution_time = end_time - start_time
-    avg_ram = (ram_before + mid_ram + ram_after) / 3
-    max_ram = max(ram_before, mid_ram, ram_after)
-    avg_cpu = (cpu_before + mid_cpu + cpu_after) / 3
-    max_cpu = max(cpu_before, mid_cpu, cpu_after)
-
-    # Przygotowanie wyników do wypisania
-    results = (
-        f"Results for query: {query['name']}\n"
-        f"Completion time: {execution_time:.4f} s\n"
-        f"Average RAM usage: {avg_ram:.4f} MB, Maximum RAM usage: {max_ram:.4f} MB\n"
-        f"Average CPU performance: {avg_cpu:.4f}%, Maximum CPU performance: {max_cpu:.4f}%\n"
-    )
+def explain_query(query):
+    """Pobiera plan wykonania z explain('executionStats'), poza mierzonym czasem."""
+    with connect_to_mongodb() as db:
+        return explain_mongo(db, query)
 
-    # Wyświetlenie wyników na konsoli
-    print(results)
 
-    # Zapisanie wyników do pliku
-    with open("result.txt", "a") as f:
-        f.write(results + "\n")
+def measure_query_performance(query):
+    """Wykonuje zapytanie MongoDB i mierzy czas wykonania, użycie RAM i CPU w tle (ResourceSampler)."""
+    measurement = measure(lambda sampler: run_query(query, sampler))
+    plan = explain_query(query) if CAPTURE_PLANS else None
+    report_results(f" {query['name']}", DATABASE_NAME, 'MongoDB', measurement, connector.mode, plan)
 
 
 # Przykładowe zapytania
@@ -318,15 +287,18 @@ queries = [
 ]
 
 def main():
-    with open("result.txt", "a") as f:
-        f.write("DATABASE TRIP (MongoDB)\n\n")
+    start_section('trip', "TRIP (MongoDB)")
 
     print("Start of tests for the 'trip' database in MongoDB...\n")
-    for query in queries:
-        measure_query_performance(query)
+    connector.open()
+    report_setup(connector)
+    try:
+        for query in queries:
+            measure_query_performance(query)
+    finally:
+        connector.close()
 
-    with open("result.txt", "a") as f:
-        f.write("==========\n")
+    write_section_line("==========\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
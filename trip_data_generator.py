@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Vectorized generator of the bike-share trip dataset (users, stations, trips).
+
+Follows the Citi Bike layout queried by trip_database_checkout.py and trip_MongoDB_checkout.py:
+gender is coded 0 (unknown), 1 (male), 2 (female), tripduration is in seconds and stations lie
+around New York. stations has a fixed size; users and trips grow with the scale factor. Run
+through dataset_generator.py:
+
+    python dataset_generator.py trip --scale-factor 10
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from appointments_database.data_generator import sample_dates, sample_keys
+
+STATION_COUNT = 1_000
+
+# Liczba wierszy tabel przy współczynniku skali 1; stacje mają stały rozmiar
+SCALE_FACTOR_ROWS = {'users': 100_000, 'stations': STATION_COUNT, 'trips': 1_000_000}
+FIXED_TABLES = {'stations'}
+
+# Kolumny z datą i godziną - w dokumentach MongoDB jako daty BSON, nie napisy
+TIMESTAMP_COLUMNS = {'trips': ['starttime', 'stoptime']}
+
+# Kolumny, dla których można ustawić rozkład Zipfa (dataset_generator.py --skew), i tabela kluczy
+SKEWABLE_COLUMNS = {'user_id': 'users', 'start_station_id': 'stations', 'end_station_id': 'stations'}
+SKEW_OPTIONS = {'seasonality'}
+
+# Szczyt sezonu przejazdów (dzień roku) - koniec lipca
+SEASONAL_PEAK_DAY = 205
+
+GENDER_WEIGHTS = [0.1, 0.68, 0.22]
+USERTYPES = ['Subscriber', 'Customer']
+SUBSCRIBER_RATE = 0.88
+
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    birth_year SMALLINT,
+    gender SMALLINT,
+    usertype VARCHAR(20)
+);
+CREATE TABLE IF NOT EXISTS stations (
+    station_id INTEGER PRIMARY KEY,
+    station_name VARCHAR(100),
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION
+);
+CREATE TABLE IF NOT EXISTS trips (
+    trip_id BIGINT PRIMARY KEY,
+    user_id INTEGER REFERENCES users (user_id),
+    bikeid INTEGER,
+    start_station_id INTEGER REFERENCES stations (station_id),
+    end_station_id INTEGER REFERENCES stations (station_id),
+    starttime TIMESTAMP,
+    stoptime TIMESTAMP,
+    tripduration INTEGER
+);
+"""
+
+
+def build_pools(seed=None):
+    """Faker street names for the station names; identical in every worker for the same seed."""
+    fake = Faker('en_US')
+    fake.seed_instance(seed)
+    return {'street': np.array([fake.street_name() for _ in range(2 * STATION_COUNT)], dtype=object)}
+
+
+def generate_users(n, rng, start_id, reference_date):
+    return pd.DataFrame({
+        'user_id': np.arange(start_id, start_id + n),
+        'birth_year': reference_date.year - rng.integers(16, 80, size=n),
+        'gender': rng.choice(3, size=n, p=GENDER_WEIGHTS),
+        'usertype': np.where(rng.random(n) < SUBSCRIBER_RATE, *USERTYPES),
+    })
+
+
+def generate_stations(rng, pools):
+    streets = pools['street']
+    first = rng.integers(0, len(streets), size=STATION_COUNT)
+    # Druga ulica skrzyżowania różna od pierwszej
+    second = (first + rng.integers(1, len(streets), size=STATION_COUNT)) % len(streets)
+    return pd.DataFrame({
+        'station_id': np.arange(1, STATION_COUNT + 1),
+        'station_name': streets[first] + ' & ' + streets[second],
+        'latitude': rng.uniform(40.65, 40.82, size=STATION_COUNT).round(6),
+        'longitude': rng.uniform(-74.03, -73.90, size=STATION_COUNT).round(6),
+    })
+
+
+def generate_trips(n, rng, start_id, context):
+    sizes, reference_date = context['sizes'], context['reference_date']
+    year = reference_date.year
+    year_start = np.datetime64(f"{year}-01-01T00:00:00", 's')
+    seconds_in_year = int((np.datetime64(f"{year + 1}-01-01T00:00:00", 's') - year_start).astype(int))
+    # Czas przejazdu log-normalny: mediana ok. 11 minut, długi ogon, minimum minuta
+    tripduration = np.maximum(60, rng.lognormal(np.log(660), 0.7, size=n).astype(np.int64))
+    if context.get('skew', {}).get('seasonality', 0.0) > 0:
+        days = sample_dates(rng, n, datetime.date(year, 1, 1), datetime.date(year, 12, 31), context, SEASONAL_PEAK_DAY)
+        starttime = days.astype('datetime64[s]') + rng.integers(0, 86400, size=n).astype('timedelta64[s]')
+    else:
+        starttime = year_start + rng.integers(0, seconds_in_year, size=n).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'trip_id': np.arange(start_id, start_id + n),
+        'user_id': sample_keys(rng, n, sizes['users'], 'user_id', context),
+        'bikeid': rng.integers(14529, 14529 + 12000, size=n),
+        'start_station_id': sample_keys(rng, n, sizes['stations'], 'start_station_id', context),
+        'end_station_id': sample_keys(rng, n, sizes['stations'], 'end_station_id', context),
+        'starttime': starttime,
+        'stoptime': starttime + tripduration.astype('timedelta64[s]'),
+        'tripduration': tripduration,
+    })
+
+
+def generate_chunk(table, start_id, n, rng, pools, context):
+    """Rows start_id .. start_id + n - 1 of one table; stations are generated whole."""
+    if table == 'users':
+        return generate_users(n, rng, start_id, context['reference_date'])
+    if table == 'stations':
+        return generate_stations(rng, pools)
+    if table == 'trips':
+        return generate_trips(n, rng, start_id, context)
+    raise ValueError(f"Unknown table: {table}")
@@ -1,10 +1,11 @@
 import os
-import time
-import psutil
-import psycopg2
-from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from benchmark_core import measure, report_results, report_setup, start_section, write_section_line
+from db_connections import PostgresConnector
+from query_plans import CAPTURE_PLANS, explain_postgres
+from resource_sampler import SERVER_METRICS, find_postgres_backend
+
 # Wczytywanie zmiennych środowiskowe z pliku .env
 load_dotenv()
 
@@ -17,65 +18,35 @@ DATABASE_CONFIG = {
     'port': os.getenv('DB_PORT')
 }
 
-@contextmanager
-def connect_to_db():
-    """Context manager for database connection."""
-    conn = psycopg2.connect(**DATABASE_CONFIG)
-    try:
-        yield conn
-    finally:
-        conn.close()
-
-def measure_query_performance(query):
-    """Executes a query and measures execution time, RAM, and CPU usage efficiently."""
-
-    # Monitorowanie procesu dla RAM i CPU
-    process = psutil.Process()
+# Pula połączeń współdzielona przez cały zestaw zapytań (PG_CONNECTION_MODE=cold wyłącza)
+connector = PostgresConnector(DATABASE_CONFIG)
 
-    # Próbka początkowa RAM-u i CPU
-    ram_before = process.memory_info().rss / (1024 * 1024)  # RAM in MB
-    cpu_before = psutil.cpu_percent(interval=None)
+def connect_to_db(sampler=None):
+    """Context manager for database connection (pooled or cold, see PG_CONNECTION_MODE)."""
+    return connector.connection(sampler)
 
-    # Start czasu wykonania zapytania
-    start_time = time.perf_counter()
-
-    # Wykonanie zapytania do bazy danych z próbkowaniem RAM i CPU w środku
-    with connect_to_db() as conn:
+def run_query(query, sampler=None):
+    """Executes a query on a pooled (or cold) connection and fetches all rows."""
+    with connect_to_db(sampler) as conn:
+        if sampler is not None and SERVER_METRICS:
+            sampler.attach_server(lambda: find_postgres_backend(conn))
         with conn.cursor() as cursor:
             cursor.execute(query)
-            # Próbka w środku zapytania
-            mid_cpu = psutil.cpu_percent(interval=None)
-            mid_ram = process.memory_info().rss / (1024 * 1024)  # RAM in MB
             cursor.fetchall()
+        if sampler is not None:
+            # Backend kończy się razem z połączeniem, więc ostatnia próbka przed close()
+            sampler.detach_server()
 
-    # Koniec czasu wykonania zapytania
-    end_time = time.perf_counter()
-
-    # Próbka końcowa RAM-u i CPU
-    ram_after = process.memory_info().rss / (1024 * 1024)  # RAM in MB
-    cpu_after = psutil.cpu_percent(interval=None)
-
-    # Obliczenia wyników
-    execution_time = end_time - start_time
-    avg_ram = (ram_before + mid_ram + ram_after) / 3
-    max_ram = max(ram_before, mid_ram, ram_after)
-    avg_cpu = (cpu_before + mid_cpu + cpu_after) / 3
-    max_cpu = max(cpu_before, mid_cpu, cpu_after)
-
-    # Przygotowanie wyników do wypisania
-    results = (
-        f"Results for query:\n{query}\n"
-        f"Completion time: {execution_time:.4f} s\n"
-        f"Average RAM usage: {avg_ram:.4f} MB, Maximum RAM usage: {max_ram:.4f} MB\n"
-        f"Average CPU performance: {avg_cpu:.4f}%, Maximum CPU performance: {max_cpu:.4f}%\n"
-    )
-
-    # Wyświetlenie wyników na konsoli
-    print(results)
+def explain_query(query):
+    """Runs the query under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), outside the timed region."""
+    with connect_to_db() as conn:
+        return explain_postgres(conn, query)
 
-    # Zapisanie wyników do pliku
-    with open("result.txt", "a") as f:  # 'a' oznacza tryb dopisywania
-        f.write(results + "\n")
+def measure_query_performance(query):
+    """Executes a query and measures execution time, RAM, and CPU usage with a background sampler."""
+    measurement = measure(lambda sampler: run_query(query, sampler))
+    plan = explain_query(query) if CAPTURE_PLANS else None
+    report_results(f"\n{query}", DATABASE_CONFIG['dbname'], 'PostgreSQL', measurement, connector.mode, plan)
 
 # Przykładowe zapytania
 queries = [
@@ -94,14 +65,17 @@ queries = [
 ]
 
 def main():
-    with open("result.txt", "a") as f:
-        f.write("DATABASE TRIP\n\n")
+    start_section('trip', "TRIP")
 
     print("Start of tests for the 'trip' database...\n")
-    for query in queries:
-        measure_query_performance(query)
+    connector.open()
+    report_setup(connector)
+    try:
+        for query in queries:
+            measure_query_performance(query)
+    finally:
+        connector.close()
 
-    with open("result.txt", "a") as f:
-        f.write("==========\n")
+    write_section_line("==========\n")
 if __name__ == "__main__":
     main()